@@ -1,26 +1,162 @@
-import requests
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from dotenv import load_dotenv
 import os
 import json
+import random
 import re
 import urllib.parse
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from cache import TTLCache
+from config.config import Config
+from job_mirror import job_mirror
+from singleflight import herkey_flight, llm_flight, make_key
+from semantic_cache import SemanticCache
+from resilience import breakers, guarded_get, hedged_get
+from llm_router import llm_router
+from json_stream import ArrayItemParser, repair_json_object
+from tracing import tracer
+from deadline import DeadlineExceeded, is_degraded, mark_degraded, wait_for
+from skills import skill_index
+
 load_dotenv()
-# Initialize your chat LLM
-chat_model = ChatOpenAI(model="gpt-4.1-nano", temperature=0.3)
+# Initialize your chat LLM (calls are routed per task, see llm_router.TASK_ROUTES)
+chat_model = llm_router.get_model("gpt-4.1-nano")
+
+CANNED_TEXT_REPLY = (
+    "I'm having trouble answering right now. Meanwhile, you can ask me to find jobs, "
+    "build a career roadmap or show upcoming events, or try your question again in a moment."
+)
+
+def invoke_chat_model(messages, task, fallback=None):
+    """
+    Invoke the fastest healthy model for the task through the LLM router, sharing
+    one call between identical concurrent requests. If fallback text is given it is
+    returned as the reply when every candidate model fails or the request's
+    deadline runs out, and the response is marked degraded.
+    """
+    key = make_key(task, [(message.type, message.content) for message in messages])
+    try:
+        return llm_flight.do(key, llm_router.invoke, task, messages)
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"LLM call for {task} failed, using fallback: {str(e)}")
+        mark_degraded(task)
+        return AIMessage(content=fallback)
 
 # Helper to get a JWT session token from Herkey
-def get_herkey_token() -> str:
-    """Get a JWT session token from Herkey API."""
-    resp = requests.get(
-        "https://api-prod.herkey.com/api/v1/herkey/generate-session"
-    )
+def _mint_herkey_token() -> str:
+    with tracer.span("herkey.mint_token"):
+        # Minting is not idempotent, so it is never hedged
+        resp = guarded_get(
+            breakers["herkey"],
+            "https://api-prod.herkey.com/api/v1/herkey/generate-session"
+        )
     resp.raise_for_status()
     return resp.json()["body"]["session_id"]
 
+def get_herkey_token() -> str:
+    """Get a JWT session token from Herkey API (concurrent mints share one request)."""
+    return herkey_flight.do("generate-session", _mint_herkey_token)
+
+# A token shared by server-side calls that do not need a per-user session
+herkey_token_cache = TTLCache(maxsize=1, ttl=int(os.getenv("HERKEY_TOKEN_TTL", "600")))
+
+def get_shared_herkey_token(refresh: bool = False) -> str:
+    """Return a cached HerKey session token, minting a new one when missing, expired or refresh=True."""
+    token = None if refresh else herkey_token_cache.get("token")
+    if token is None:
+        token = get_herkey_token()
+        herkey_token_cache.set("token", token)
+    return token
+
+# Simple job queries ("remote python developer jobs in Pune") are parsed by template
+# without the LLM; anything the template does not fully account for goes to the LLM
+JOB_QUERY_TEMPLATE = re.compile(
+    r"^(?P<role>[a-z0-9+#./' -]*?)\s*\b(?P<noun>jobs?|roles?|positions?|openings?|vacancy|vacancies|opportunities|internships?)\b"
+    r"(?:\s+(?:in|at|near|around)\s+(?P<location>[a-z .]+))?$"
+)
+JOB_QUERY_TERMS = {
+    "work_mode": {
+        "remote": "work_from_home", "work from home": "work_from_home", "wfh": "work_from_home",
+        "hybrid": "hybrid", "onsite": "work_from_office", "on-site": "work_from_office", "work from office": "work_from_office",
+    },
+    "job_types": {
+        "full time": "full_time", "full-time": "full_time", "part time": "part_time", "part-time": "part_time",
+        "freelance": "freelance", "returnship": "returnee_program", "returnee": "returnee_program", "volunteer": "volunteer",
+    },
+}
+JOB_QUERY_TERM_PATTERNS = [
+    (field, value, re.compile(rf"(?<![\w-]){re.escape(term)}(?![\w-])"))
+    for field, terms in JOB_QUERY_TERMS.items()
+    for term, value in terms.items()
+]
+JOB_QUERY_FILLER = {
+    "find", "me", "show", "search", "for", "look", "looking", "i", "i'm", "im", "am", "want", "need", "get",
+    "any", "some", "a", "an", "the", "latest", "new", "recent", "please", "can", "could", "you", "list", "are",
+    "there", "open", "available",
+}
+# Words that point at earlier turns or add conditions the template cannot express
+JOB_QUERY_CONTEXT_WORDS = {
+    "that", "those", "this", "these", "it", "them", "similar", "more", "other", "same", "like", "my", "again",
+    "with", "without", "not", "but", "except", "than", "under", "over", "salary", "paying", "based",
+}
+KNOWN_JOB_LOCATIONS = {
+    "india", "bangalore", "bengaluru", "mumbai", "delhi", "new delhi", "gurgaon", "gurugram", "noida", "hyderabad",
+    "chennai", "pune", "kolkata", "ahmedabad", "jaipur", "kochi", "chandigarh", "indore", "coimbatore", "lucknow",
+    "nagpur", "thiruvananthapuram", "trivandrum", "mysore", "mysuru", "bhubaneswar", "vadodara", "visakhapatnam", "goa",
+}
+job_param_stats = {"template": 0, "llm": 0}
+
+def match_job_query_template(query: str):
+    """
+    Parse a self-contained job query of the form "[filler] <role> jobs [in <known city>]",
+    with work mode and job type words anywhere. Returns the job search params, or None
+    if any part of the query is not understood (the caller then asks the LLM).
+    """
+    text = " ".join(re.sub(r"[?!,;:]+", " ", query.lower()).split()).rstrip(".")
+    params = {}
+    for field, value, pattern in JOB_QUERY_TERM_PATTERNS:
+        if pattern.search(text):
+            if params.get(field, value) != value:
+                return None
+            params[field] = value
+            text = pattern.sub(" ", text)
+
+    match = JOB_QUERY_TEMPLATE.match(" ".join(text.split()))
+    if not match:
+        return None
+    location = (match.group("location") or "").strip(" .")
+    if location:
+        if location not in KNOWN_JOB_LOCATIONS:
+            return None
+        params["location_name"] = location.title()
+
+    words = [word for word in match.group("role").split() if word not in JOB_QUERY_FILLER and re.search(r"[a-z0-9]", word)]
+    if not words or len(words) > 5 or any(word in JOB_QUERY_CONTEXT_WORDS for word in words):
+        return None
+    # The job API matches keywords literally, so aliases go out under their canonical name
+    keyword = skill_index.canonicalize(" ".join(words), include_ambiguous=False)
+    if match.group("noun").startswith("internship"):
+        keyword += " internship"
+    params.update(page_no=1, page_size=15, keyword=keyword, is_global_query="false")
+    return enrich_job_skills(params, keyword)
+
+def enrich_job_skills(params: dict, query: str) -> dict:
+    """
+    Map the job_skills onto the skill taxonomy's canonical names and add the taxonomy
+    skills named in the query, so job_skills no longer depends on the LLM noticing them.
+    """
+    skills = [skill_index.canonical(s) or s.strip() for s in str(params.get("job_skills", "")).split(",") if s.strip()]
+    skills = list(dict.fromkeys(skills + skill_index.find(query, include_ambiguous=False)))
+    if skills:
+        params["job_skills"] = ",".join(skills)
+    return params
+
 # Job search function - extracts parameters from a query
 def extract_job_search_params(query: str, conversation_history=None) -> dict:
     """
@@ -31,6 +167,12 @@ def extract_job_search_params(query: str, conversation_history=None) -> dict:
         query (str): The user's current query/message
         conversation_history (list, optional): Previous conversations in chronological order
     """
+    params = match_job_query_template(query)
+    if params is not None:
+        job_param_stats["template"] += 1
+        return params
+    job_param_stats["llm"] += 1
+
     system_prompt = """
     You are a job search parameter extractor for the Herkey API.
     Extract job search parameters from the user's query and return them in a JSON format.
@@ -81,7 +223,8 @@ def extract_job_search_params(query: str, conversation_history=None) -> dict:
     else:
         messages.append(HumanMessage(content=query))
     
-    response = chat_model(messages)
+    with tracer.span("extract_job_search_params"):
+        response = invoke_chat_model(messages, "extract_job_params", fallback="")
     content = response.content.strip()
     
     # Extract JSON from the response if it's wrapped in code fences
@@ -104,35 +247,138 @@ def extract_job_search_params(query: str, conversation_history=None) -> dict:
             if params[key] == "any" or params[key] == "all" or (isinstance(params[key], str) and params[key].strip() == ""):
                 del params[key]
         
-        return params
+        return enrich_job_skills(params, query)
     except json.JSONDecodeError:
         # If JSON parsing fails, return basic parameters with query as keyword
-        return {
+        return enrich_job_skills({
             "page_no": 1,
             "page_size": 15,
             "keyword": query.strip(),
             "is_global_query": "false"
-        }
+        }, query)
 
-# Get job search results from the Herkey API
-def get_job_search_results(params: dict) -> dict:
+# Profile location preferences mapped onto HerKey work modes
+LOCATION_PREFERENCE_WORK_MODES = {
+    "remote": "work_from_home",
+    "hybrid": "hybrid",
+    "onsite": "work_from_office",
+}
+GENERIC_JOB_KEYWORDS = {"job", "jobs", "a job", "any job", "find me a job", "find jobs", "openings", "opportunities"}
+
+def personalize_job_params(params: dict, user_profile: dict) -> dict:
     """
-    Search for jobs on the Herkey API with the given parameters.
-    Returns a dictionary with the search results.
+    Fill gaps in the extracted job params from the user's cached profile:
+    work mode from the location preference, location from the profile, and
+    skills when the query itself was generic. Anything the user asked for wins.
     """
+    if not user_profile:
+        return params
+    params = dict(params)
+
+    work_mode = LOCATION_PREFERENCE_WORK_MODES.get((user_profile.get("locationPreference") or "").lower())
+    if work_mode and "work_mode" not in params:
+        params["work_mode"] = work_mode
+
+    if "location_name" not in params and user_profile.get("location") and params.get("work_mode") != "work_from_home":
+        params["location_name"] = user_profile["location"]
+
+    skills = user_profile.get("skills") or []
+    if skills and "job_skills" not in params and params.get("keyword", "").strip().lower() in GENERIC_JOB_KEYWORDS:
+        params["job_skills"] = ",".join(skills[:5])
+
+    return params
+
+def project_fields(data: dict, spec: dict) -> dict:
+    """Keep only the keys named in spec; nested dicts in spec project nested objects."""
+    projected = {}
+    for key, sub_spec in spec.items():
+        if key not in data:
+            continue
+        value = data[key]
+        if isinstance(sub_spec, dict) and isinstance(value, dict):
+            value = project_fields(value, sub_spec)
+        projected[key] = value
+    return projected
+
+# Job view
+# The job card renders only these fields, so results are projected to them before
+# they reach the client (and the stored conversation). JOB_VIEW_FIELDS="id,title,..."
+# overrides the list; the job routes take ?fields= or ?full=true per request.
+DEFAULT_JOB_VIEW_FIELDS = (
+    "id", "title", "company_name", "company_logo", "location_name", "skills", "work_mode",
+    "job_types", "min_year", "max_year", "status", "expires_on", "boosted",
+)
+JOB_VIEW_FIELDS = {
+    field.strip(): True
+    for field in os.getenv("JOB_VIEW_FIELDS", ",".join(DEFAULT_JOB_VIEW_FIELDS)).split(",")
+    if field.strip()
+}
+JOB_VIEW_SAMPLE_RATE = float(os.getenv("JOB_VIEW_SAMPLE_RATE", "0.05"))
+job_view_stats = {"sampled_responses": 0, "full_bytes": 0, "view_bytes": 0}
+
+def job_view_spec(fields: str = None, full: bool = False):
+    """The projection spec for a request: None for full jobs, the requested fields
+    (the id is always kept), or the default JOB_VIEW_FIELDS."""
+    if full:
+        return None
+    if fields:
+        spec = {field.strip(): True for field in fields.split(",") if field.strip()}
+        return {"id": True, **spec}
+    return JOB_VIEW_FIELDS
+
+def record_job_view_bytes(full_jobs: list, view_jobs: list):
+    """Measure encoded sizes before and after projection for a sample of responses."""
+    if not full_jobs or random.random() >= JOB_VIEW_SAMPLE_RATE:
+        return
+    job_view_stats["sampled_responses"] += 1
+    job_view_stats["full_bytes"] += len(json.dumps(full_jobs, default=str))
+    job_view_stats["view_bytes"] += len(json.dumps(view_jobs, default=str))
+
+def job_view_snapshot() -> dict:
+    full, view = job_view_stats["full_bytes"], job_view_stats["view_bytes"]
+    return {**job_view_stats, "saved_ratio": round(1 - view / full, 3) if full else None}
+
+# Get job search results from the Herkey API
+# Last successful result per search, served when HerKey fails or its circuit is open
+last_good_job_results = TTLCache(maxsize=1000, ttl=int(os.getenv("STALE_JOB_RESULTS_TTL", "21600")))
+
+def _fetch_candidate_jobs(params: dict) -> dict:
     token = get_herkey_token()
     headers = {"Authorization": f"Token {token}"}
-    
-    try:
-        resp = requests.get(
+    with tracer.span("es_candidate_jobs", keyword=params.get("keyword")) as span:
+        resp = hedged_get(
+            breakers["herkey"],
             "https://api-prod.herkey.com/api/v1/herkey/jobs/es_candidate_jobs",
             params=params,
             headers=headers,
         )
         resp.raise_for_status()
-        response_data = resp.json()
+        data = resp.json()
+        span.set(results=len(data.get("body") or []))
+    return data
+
+def get_job_search_results(params: dict, view=JOB_VIEW_FIELDS) -> dict:
+    """
+    Search for jobs on the Herkey API with the given parameters.
+    Returns a dictionary with the search results; expired jobs are dropped and the
+    rest projected to the view spec in the same pass (view=None keeps full jobs).
+    """
+    # Serve from the local mirror when it has matches, otherwise fall back to HerKey
+    if Config.JOB_MIRROR_ENABLED:
+        local_results = job_mirror.search(params)
+        if local_results is not None:
+            if view is None:
+                return local_results
+            view_jobs = [project_fields(job, view) for job in local_results["body"]]
+            record_job_view_bytes(local_results["body"], view_jobs)
+            return {**local_results, "body": view_jobs}
+
+    key = make_key("es_candidate_jobs", params, view)
+    try:
+        # Identical concurrent searches share one upstream call
+        response_data = herkey_flight.do(make_key("es_candidate_jobs", params), _fetch_candidate_jobs, params)
         
-        # Filter out expired jobs
+        # Filter out expired jobs and project the rest
         if response_data.get("body"):
             current_date = datetime.now()
             valid_jobs = []
@@ -142,123 +388,214 @@ def get_job_search_results(params: dict) -> dict:
                 if "expires_on" in job:
                     try:
                         expiry_date = datetime.strptime(job["expires_on"], "%Y-%m-%d %H:%M:%S")
-                        if expiry_date > current_date:
-                            valid_jobs.append(job)
+                        if expiry_date <= current_date:
+                            continue
                     except (ValueError, TypeError):
                         # If date parsing fails, include the job anyway
-                        valid_jobs.append(job)
-                else:
-                    # If no expiry date, include the job
-                    valid_jobs.append(job)
+                        pass
+                # If no expiry date, include the job
+                valid_jobs.append(job if view is None else project_fields(job, view))
             
-            response_data["body"] = valid_jobs
+            if view is not None:
+                record_job_view_bytes(response_data["body"], valid_jobs)
+            # Build a new dict: the fetched response may be shared with coalesced callers
+            response_data = {**response_data, "body": valid_jobs}
             
+        last_good_job_results.set(key, response_data)
         return response_data
     except Exception as e:
+        # Fall back to the last good result for the same search while HerKey is down
+        stale = last_good_job_results.get(key)
+        if stale is not None:
+            mark_degraded("job_results")
+            return {**stale, "stale": True}
+        if isinstance(e, DeadlineExceeded):
+            raise
         return {"error": f"Error searching for jobs: {str(e)}"}
 
-# Generate a roadmap for a given topic
-def generate_roadmap(topic: str, conversation_history=None) -> list:
+# Job paging
+# A chat turn registers its canonical search params under a search_id. Later pages
+# are fetched straight from HerKey with those params, and the page after the one
+# being served is prefetched in the background so paging never touches the LLM.
+JOB_PAGE_SIZE = 15
+PAGING_PARAMS = ("page_no", "page_size", "session_id")
+
+job_search_cache = TTLCache(maxsize=2000, ttl=int(os.getenv("JOB_SEARCH_TTL", "1800")))
+job_page_cache = TTLCache(maxsize=500, ttl=int(os.getenv("JOB_PAGE_TTL", "300")))
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="job-prefetch")
+_prefetching = {}
+_prefetching_lock = threading.Lock()
+
+def canonicalize_job_params(params: dict) -> dict:
+    """Return the search params without paging/session fields, with sorted keys and trimmed values."""
+    canonical = {}
+    for key in sorted(params):
+        if key in PAGING_PARAMS:
+            continue
+        value = params[key]
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ("", None):
+            continue
+        canonical[key] = value
+    return canonical
+
+def register_job_search(params: dict) -> str:
+    """Cache the canonical params of a search and return its search_id."""
+    canonical = canonicalize_job_params(params)
+    search_id = hashlib.sha1(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    job_search_cache.set(search_id, canonical)
+    return search_id
+
+def _page_key(canonical: dict, page_no: int, page_size: int, view) -> tuple:
+    return (json.dumps(canonical, sort_keys=True), page_no, page_size, json.dumps(view, sort_keys=True))
+
+def _fetch_job_page(canonical: dict, page_no: int, page_size: int, view=JOB_VIEW_FIELDS) -> dict:
+    jobs_data = get_job_search_results({**canonical, "page_no": page_no, "page_size": page_size}, view)
+    if "error" not in jobs_data:
+        job_page_cache.set(_page_key(canonical, page_no, page_size, view), jobs_data)
+    return jobs_data
+
+def prefetch_job_page(canonical: dict, page_no: int, page_size: int = JOB_PAGE_SIZE, view=JOB_VIEW_FIELDS):
+    """Fetch a page in the background unless it is already cached or in flight."""
+    key = _page_key(canonical, page_no, page_size, view)
+    if key in job_page_cache:
+        return
+    with _prefetching_lock:
+        if key in _prefetching:
+            return
+        future = _prefetch_executor.submit(_fetch_job_page, canonical, page_no, page_size, view)
+        _prefetching[key] = future
+
+    def _done(_):
+        with _prefetching_lock:
+            _prefetching.pop(key, None)
+    future.add_done_callback(_done)
+
+def get_job_page(search_id: str, page_no: int = 1, page_size: int = JOB_PAGE_SIZE, view=JOB_VIEW_FIELDS):
     """
-    Generate a structured learning roadmap for the given topic.
-    Returns a list of roadmap items.
-    
-    Args:
-        topic (str): The topic to generate a roadmap for
-        conversation_history (list, optional): Previous conversations in chronological order
+    Return one page of results for a registered search, or None if the search_id is unknown.
+    Serves from the page cache (or a prefetch already in flight) and prefetches the next page.
+    Jobs are projected to the view spec (see job_view_spec).
     """
-    system_prompt = """
-    Create a detailed career guidance roadmap specifically tailored for women in professional settings. The roadmap should address one of these three user personas:
-    
-    1. FRESHERS: Women just beginning their career, seeking guidance on entry-level positions and early career development
-    2. RISERS: Women with 3-8 years of experience looking to advance to leadership positions
-    3. REJOINERS: Women returning to the workforce after a career break (maternity, caregiving, etc.)
-    
-    Based on the user's query, determine which persona they best align with, and create a comprehensive roadmap with 5-8 well-structured steps that progress logically.
-
-    For each step in the roadmap, provide:
-    1. A clear, actionable title that communicates the specific goal of this career development phase
-    2. A detailed description (3-5 sentences) with specific advice tailored for women in the workforce that explains the WHY, HOW, and EXPECTED OUTCOME of this step
-    3. A real, functioning URL to relevant resources from recognized organizations like LinkedIn Learning, Coursera, Udemy, or women-focused career sites like HerKey, Lean In, or Women Who Code
-
-    Focus on addressing these key challenges women face in the workplace:
-    - Skill development relevant to the specified field or role, including both technical and soft skills
-    - Networking and mentorship opportunities specifically designed for women's advancement
-    - Work-life balance strategies and overcoming gender-specific workplace challenges like impostor syndrome
-    - Confidence building, assertiveness training, and leadership development paths
-    - Resume/CV enhancement, personal branding, and interview preparation with emphasis on salary negotiation
-    - Navigating workplace biases and creating allies across organizational hierarchies
-
-    For FRESHERS, emphasize:
-    - Building foundational skills and identifying strengths
-    - Creating a professional presence online and offline
-    - Finding entry-level positions that offer growth potential
-    - Establishing mentorship relationships early in career
-    - Understanding workplace dynamics and communication styles
-
-    For RISERS, emphasize:
-    - Strategic visibility and influence building
-    - Developing leadership capabilities and executive presence
-    - Creating a personal leadership brand and style
-    - Negotiation tactics for promotions and additional responsibilities
-    - Building networks that support advancement opportunities
-    - Work-life integration strategies for sustainable career growth
-
-    For REJOINERS, emphasize:
-    - Skills assessment and targeted upskilling opportunities
-    - Confidence rebuilding and addressing imposter syndrome 
-    - Explaining career gaps effectively in applications and interviews
-    - Flexible work arrangements and setting boundaries
-    - Leveraging past experience while demonstrating current relevance
-    - Accelerated reintegration strategies
-
-    Format your response as a JSON array where each item has the keys:
-    - title: The name of the step (be specific and action-oriented)
-    - description: A comprehensive explanation with actionable advice
-    - link: A URL to learn more (use REAL, EXISTING resources from trusted sites)
-    
-    Example for a FRESHER in technology:
-    [
-      {
-        "title": "Assess Your Technical and Soft Skill Foundation",
-        "description": "Begin by conducting a thorough self-assessment of your current skills, interests, and career aspirations within the technology field. Identify gaps between your current abilities and entry-level job requirements by analyzing job postings and speaking with professionals. Use structured assessment tools to understand your technical proficiencies, communication styles, and areas where targeted development would bring the greatest career benefits.",
-        "link": "https://www.herkey.com/resources/herkey-skill-assessment-tool"
-      },
-      {
-        "title": "Build a Technical Foundation Through Structured Learning",
-        "description": "Develop essential technical skills through structured courses focused specifically on women entering tech fields. Prioritize learning paths that combine theoretical knowledge with practical application opportunities to build your portfolio. Consider completing industry-recognized certifications that validate your skills to employers while providing structured learning objectives.",
-        "link": "https://www.coursera.org/collections/women-building-careers-tech"
-      }
-    ]
-    
-    Example for a REJOINER in finance:
-    [
-      {
-        "title": "Update Industry Knowledge and Technical Skills",
-        "description": "The financial industry evolves rapidly with new regulations, technologies, and practices emerging during even short career breaks. Identify specific knowledge gaps by researching current job descriptions and industry publications to understand what's changed since your departure. Take targeted courses focusing on the most critical updates in your finance specialty, particularly around financial technology and compliance changes that have occurred during your absence.",
-        "link": "https://www.linkedin.com/learning/paths/return-to-work-in-financial-services-after-a-career-break"
-      },
-      {
-        "title": "Leverage Return-to-Work Programs in Finance",
-        "description": "Many financial institutions now offer specialized returnship programs designed specifically for professionals returning after career breaks. These structured programs typically combine refresher training, mentorship, and project work to ease the transition back to full-time employment. Application processes are often less focused on recent work history and more on your entire career experience and transferable skills.",
-        "link": "https://www.jpmorgan.com/impact/people/returntoworkprogams"
-      }
-    ]
-    
-    Return ONLY the JSON array without any additional text, explanations, or markdown formatting.
+    canonical = job_search_cache.get(search_id)
+    if canonical is None:
+        return None
+
+    key = _page_key(canonical, page_no, page_size, view)
+    jobs_data = job_page_cache.get(key)
+    if jobs_data is None:
+        with _prefetching_lock:
+            future = _prefetching.get(key)
+        jobs_data = wait_for(future) if future else _fetch_job_page(canonical, page_no, page_size, view)
+
+    if jobs_data.get("body"):
+        prefetch_job_page(canonical, page_no + 1, page_size, view)
+    return jobs_data
+
+# Roadmap prompts
+# Only the persona that applies is sent, about a fifth of the old all-persona
+# prompt. At roughly 330 tokens a persona prompt is below the 1024-token minimum
+# for provider prompt caching, so the saving comes from the smaller prompt alone.
+ROADMAP_PROMPT_PREFIX = """
+You create career guidance roadmaps for women in professional settings.
+Return a JSON array of 5-8 steps that progress logically. Each item has the keys:
+- title: a specific, action-oriented name for the step
+- description: 3-5 sentences covering the WHY, HOW and EXPECTED OUTCOME, with advice tailored to women in the workforce
+- link: a REAL, EXISTING resource from LinkedIn Learning, Coursera, Udemy, HerKey, Lean In or Women Who Code
+Cover the relevant technical and soft skills, networking and mentorship, confidence and bias at work, and resume, interview and salary negotiation where they fit.
+Return ONLY the JSON array without any additional text, explanations, or markdown formatting.
+"""
+
+ROADMAP_PERSONA_PROMPTS = {
+    "fresher": """
+Persona: FRESHER - a woman beginning her career.
+Emphasize foundational skills and strengths, a professional presence online and offline, entry-level roles with growth potential, early mentorship and workplace communication.
+Example item:
+{"title": "Build a Technical Foundation Through Structured Learning", "description": "Develop essential skills through structured courses aimed at women entering the field. Prefer paths that pair theory with portfolio projects. Finish with an industry-recognized certification that validates your skills to employers.", "link": "https://www.coursera.org/collections/women-building-careers-tech"}
+""",
+    "riser": """
+Persona: RISER - a woman with 3-8 years of experience moving towards leadership.
+Emphasize strategic visibility and influence, executive presence and a personal leadership brand, negotiating promotions, sponsorship networks and sustainable work-life integration.
+Example item:
+{"title": "Negotiate Your Next Promotion", "description": "Document the measurable impact you have delivered over the last year and map it to the next role's expectations. Rehearse the conversation with a mentor and anchor on market data. Leave with an agreed plan and timeline rather than a vague promise.", "link": "https://leanin.org/negotiation"}
+""",
+    "rejoiner": """
+Persona: REJOINER - a woman returning to work after a career break (maternity, caregiving, etc.).
+Emphasize a skills assessment and targeted upskilling, rebuilding confidence, explaining the career gap, returnship programs, flexible work arrangements and leveraging past experience.
+Example item:
+{"title": "Leverage Return-to-Work Programs", "description": "Many employers now run returnship programs for professionals coming back from a break. They combine refresher training, mentorship and project work to ease the transition. Selection focuses on your whole career and transferable skills rather than recent history.", "link": "https://www.herkey.com/jobs?job_types=returnee_program"}
+""",
+}
+
+# Profile stages collected during onboarding, mapped onto roadmap personas
+PROFESSIONAL_STAGE_PERSONAS = {
+    "student": "fresher",
+    "entry": "fresher",
+    "mid": "riser",
+    "senior": "riser",
+}
+
+PERSONA_KEYWORDS = {
+    "rejoiner": [
+        "career break", "career gap", "returning", "return to work", "rejoin", "restart my career",
+        "back to work", "comeback", "maternity", "caregiving", "returnship", "after a break",
+    ],
+    "riser": [
+        "leadership", "promotion", "manager", "senior", "executive", "lead a team", "years of experience",
+        "mid-level", "mid level", "next level",
+    ],
+    "fresher": [
+        "fresher", "graduate", "student", "college", "first job", "entry level", "entry-level",
+        "internship", "beginner", "just starting",
+    ],
+}
+
+def detect_persona(text: str, professional_stage: str = None) -> str:
     """
-    
+    Pick the roadmap persona for a request without calling the LLM.
+    An explicit career break in the text wins, then the profile's professionalStage,
+    then whichever of riser and fresher matches more keywords ("senior year of
+    college" is a fresher, so ties go to fresher); defaults to fresher.
+    """
+    lowered = text.lower()
+    if any(keyword in lowered for keyword in PERSONA_KEYWORDS["rejoiner"]):
+        return "rejoiner"
+
+    if professional_stage and professional_stage.lower() in PROFESSIONAL_STAGE_PERSONAS:
+        return PROFESSIONAL_STAGE_PERSONAS[professional_stage.lower()]
+
+    scores = {persona: sum(keyword in lowered for keyword in PERSONA_KEYWORDS[persona]) for persona in ("riser", "fresher")}
+    return "riser" if scores["riser"] > scores["fresher"] else "fresher"
+
+def build_roadmap_system_prompt(persona: str) -> str:
+    """Return the static system prompt for a persona."""
+    return ROADMAP_PROMPT_PREFIX + ROADMAP_PERSONA_PROMPTS.get(persona, ROADMAP_PERSONA_PROMPTS["fresher"])
+
+# Roadmaps are parsed item by item: a malformed step is repaired, or re-requested
+# on its own, instead of discarding the whole roadmap
+ROADMAP_MAX_ITEM_RETRIES = int(os.getenv("ROADMAP_MAX_ITEM_RETRIES", "2"))
+ROADMAP_DEFAULT_LINK = "https://www.herkey.com/resources"
+roadmap_stats = {"items": 0, "repaired": 0, "rerequested": 0, "dropped": 0}
+
+def build_roadmap_messages(topic: str, conversation_history=None, professional_stage=None) -> list:
+    """The persona system prompt plus the request, with the last 3 messages as context."""
+    recent_history = []
+    if conversation_history:
+        # The history is already in chronological order from oldest to newest
+        # Include the last 3 messages for context
+        recent_history = conversation_history[-3:]
+
+    history_text = " ".join(convo.get("message", "") for convo in recent_history)
+    persona = detect_persona(f"{history_text} {topic}", professional_stage)
+
     messages = [
-        SystemMessage(content=system_prompt),
+        SystemMessage(content=build_roadmap_system_prompt(persona)),
     ]
     
     # Add conversation history context if available
-    if conversation_history and len(conversation_history) > 0:
+    if recent_history:
         context = "Previous messages (in chronological order):\n"
-        # The history is already in chronological order from oldest to newest
-        # Include the last 3 messages for context
-        recent_history = conversation_history[-3:] if len(conversation_history) > 3 else conversation_history
-        
         for convo in recent_history:
             user_message = convo.get("message", "")
             if user_message:
@@ -268,40 +605,172 @@ def generate_roadmap(topic: str, conversation_history=None) -> list:
         messages.append(HumanMessage(content=f"{context}Create a learning roadmap for: {topic}"))
     else:
         messages.append(HumanMessage(content=f"Create a learning roadmap for: {topic}"))
+    return messages
+
+def error_roadmap(topic: str) -> list:
+    return [
+        {
+            "title": "Error Creating Roadmap",
+            "description": f"We couldn't create a roadmap for '{topic}'. Please try a different topic or phrase your request differently to get personalized career guidance.",
+            "link": ROADMAP_DEFAULT_LINK
+        }
+    ]
+
+def validate_roadmap_item(item):
+    """Return a clean roadmap item, or None if it lacks a title or description."""
+    if not isinstance(item, dict):
+        return None
+    title, description = item.get("title"), item.get("description")
+    if not isinstance(title, str) or not title.strip() or not isinstance(description, str) or not description.strip():
+        return None
+    link = item.get("link")
+    return {
+        "title": title.strip(),
+        "description": description.strip(),
+        "link": link.strip() if isinstance(link, str) and link.strip() else ROADMAP_DEFAULT_LINK,
+    }
+
+def rerequest_roadmap_item(topic: str, raw: str):
+    """Ask the model to rewrite just one malformed step as a valid JSON object."""
+    messages = [
+        SystemMessage(content=ROADMAP_PROMPT_PREFIX),
+        HumanMessage(content=(
+            f"One step of a learning roadmap for '{topic}' came back as invalid JSON:\n{raw[:2000]}\n\n"
+            "Return ONLY this single step as a valid JSON object with the keys title, description and link."
+        )),
+    ]
+    content = invoke_chat_model(messages, "roadmap", fallback="").content
+    match = re.search(r"\{[\s\S]*\}", content)
+    return validate_roadmap_item(repair_json_object(match.group(0))) if match else None
+
+def parse_roadmap_items(chunks, topic: str):
+    """
+    Yield validated roadmap items from streamed text chunks as soon as each one closes.
+    A malformed item is repaired locally, or re-requested on its own (up to
+    ROADMAP_MAX_ITEM_RETRIES per roadmap); if that fails too it is dropped.
+    """
+    parser = ArrayItemParser()
+    retries = ROADMAP_MAX_ITEM_RETRIES
+
+    def resolve(raw):
+        nonlocal retries
+        try:
+            item = validate_roadmap_item(json.loads(raw))
+        except json.JSONDecodeError:
+            item = None
+        if item is None:
+            item = validate_roadmap_item(repair_json_object(raw))
+            if item is not None:
+                roadmap_stats["repaired"] += 1
+        if item is None and retries > 0:
+            retries -= 1
+            roadmap_stats["rerequested"] += 1
+            item = rerequest_roadmap_item(topic, raw)
+        roadmap_stats["items" if item is not None else "dropped"] += 1
+        return item
+
+    for chunk in chunks:
+        for raw in parser.feed(chunk):
+            item = resolve(raw)
+            if item is not None:
+                yield item
+        if parser.done:
+            return
+    # The stream ended inside an item (e.g. truncated output)
+    if parser.remainder():
+        item = resolve(parser.remainder())
+        if item is not None:
+            yield item
+
+# Generate a roadmap for a given topic
+def generate_roadmap(topic: str, conversation_history=None, professional_stage=None) -> list:
+    """
+    Generate a structured learning roadmap for the given topic.
+    Returns a list of roadmap items.
     
-    response = chat_model(messages)
-    content = response.content.strip()
-    
-    # Extract JSON from the response if it's wrapped in code fences
-    if content.startswith("```") and content.endswith("```"):
-        content = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", content).group(1)
+    Args:
+        topic (str): The topic to generate a roadmap for
+        conversation_history (list, optional): Previous conversations in chronological order
+        professional_stage (str, optional): The user's profile stage, used to pick the persona
+    """
+    messages = build_roadmap_messages(topic, conversation_history, professional_stage)
+    response = invoke_chat_model(messages, "roadmap", fallback="")
     
+    # Items are parsed one by one, so a bad step no longer loses the whole roadmap
+    roadmap = list(parse_roadmap_items([response.content], topic))
+    return roadmap or error_roadmap(topic)
+
+def stream_roadmap(topic: str, conversation_history=None, professional_stage=None):
+    """
+    Like generate_roadmap, but streams the completion and yields each roadmap item
+    as soon as the model closes it. Yields the error roadmap if no item arrives.
+    """
+    messages = build_roadmap_messages(topic, conversation_history, professional_stage)
+    chunks = (chunk.content for chunk in llm_router.stream("roadmap", messages))
+    produced = False
     try:
-        roadmap = json.loads(content)
-        return roadmap
-    except json.JSONDecodeError:
-        # If parsing fails, return a simple error roadmap
-        return [
-            {
-                "title": "Error Creating Roadmap",
-                "description": f"We couldn't create a roadmap for '{topic}'. Please try a different topic or phrase your request differently to get personalized career guidance.",
-                "link": "https://www.herkey.com/resources"
-            }
-        ]
+        for item in parse_roadmap_items(chunks, topic):
+            produced = True
+            yield item
+    except Exception as e:
+        # Keep what was already sent; only report an error if nothing was
+        print(f"Roadmap stream failed: {str(e)}")
+    if not produced:
+        yield from error_roadmap(topic)
+
+# Intents the router can pick; one message may carry several
+INTENTS = ("job_search", "roadmap", "events", "normal_text")
+MAX_INTENTS = int(os.getenv("MAX_INTENTS", "3"))
+
+def parse_intents(content: str, query: str) -> list:
+    """
+    Turn the classifier's reply into [{"intent", "query"}, ...]. Accepts the JSON
+    array asked for, or a reply that is exactly one bare category name (which then
+    gets the whole query); anything else is normal_text, marked "fallback" since
+    the classifier did not actually pick it. Unknown intents and repeats are
+    dropped; normal_text only stands alone.
+    """
+    items = []
+    match = re.search(r"\[[\s\S]*\]", content)
+    if match:
+        try:
+            parsed = json.loads(match.group(0))
+            items = [item for item in parsed if isinstance(item, dict)]
+        except json.JSONDecodeError:
+            items = []
+    if not items:
+        # Not a scan for category names: "this is not a job_search" must not become one
+        word = content.strip().strip("`'\".").strip().lower()
+        items = [{"intent": word}] if word in INTENTS else []
+
+    intents = []
+    for item in items:
+        intent = str(item.get("intent", "")).strip().lower()
+        if intent not in INTENTS or any(i["intent"] == intent for i in intents):
+            continue
+        sub_query = item.get("query")
+        intents.append({"intent": intent, "query": sub_query.strip() if isinstance(sub_query, str) and sub_query.strip() else query})
+
+    if len(intents) > 1:
+        intents = [i for i in intents if i["intent"] != "normal_text"]
+    return intents[:MAX_INTENTS] or [{"intent": "normal_text", "query": query, "fallback": True}]
 
 # Classify user query
-def classify_query(query: str) -> str:
+def classify_intents(query: str) -> list:
     """
-    Classify the user query as job_search, roadmap, or normal_text.
+    Classify the user query into one or more intents (job_search, roadmap, events,
+    normal_text), each with the part of the message it refers to.
     """
     system_prompt = """
-    Classify the user's query into one of these three categories:
+    Classify the user's message into one or more of these categories:
     1. job_search - If the user is looking for job listings, opportunities, or asking about positions
     2. roadmap - If the user is asking for a learning path, career progression steps, or a roadmap for a topic
-    3. normal_text - For general questions, greetings, or anything else
-    4. events - If the user is asking about events, workshops, or meetups
+    3. events - If the user is asking about events, workshops, or meetups
+    4. normal_text - For general questions, greetings, or anything else
     
-    Respond with only one of these three words: job_search, roadmap, or normal_text
+    A message may ask for several things (e.g. a roadmap and job openings); list each one.
+    Respond with only a JSON array, one item per request in the order asked, formatted as:
+    [{"intent": "roadmap", "query": "the part of the message for this request"}]
     """
     
     messages = [
@@ -309,24 +778,41 @@ def classify_query(query: str) -> str:
         HumanMessage(content=query)
     ]
     
-    response = chat_model(messages)
-    classification = response.content.strip().lower()
-    
-    # Ensure we only return one of the valid categories
-    if classification not in ["job_search", "roadmap", "normal_text","events"]:
-        # Default to normal_text if classification is unclear
-        classification = "normal_text"
-    
-    return classification
+    with tracer.span("classify_query") as span:
+        try:
+            response = invoke_chat_model(messages, "classify")
+            intents = parse_intents(response.content.strip(), query)
+        except Exception as e:
+            print(f"Classification failed, answering as normal_text: {str(e)}")
+            mark_degraded("classify")
+            intents = [{"intent": "normal_text", "query": query, "fallback": True}]
+        span.set(intents=[i["intent"] for i in intents])
+    return intents
+
+def classify_query(query: str) -> str:
+    """
+    Classify the user query as job_search, roadmap, events or normal_text (its first intent).
+    """
+    return classify_intents(query)[0]["intent"]
+
+# Answers to context-free questions, matched by meaning so rewordings also hit
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+text_response_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+    ttl=int(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+    capacity=int(os.getenv("SEMANTIC_CACHE_CAPACITY", "2000")),
+)
 
 # Generate a text response for normal conversation
-def generate_text_response(query: str, conversation_history=None) -> str:
+def generate_text_response(query: str, conversation_history=None, cache=False) -> str:
     """
     Generate a conversational response for general inquiries.
     
     Args:
         query (str): The user's current query/message
         conversation_history (list, optional): Previous conversations in chronological order
+        cache (bool, optional): Whether the answer may go into text_response_cache; only for
+            queries confidently classified as normal_text
     """
     system_prompt = """
     You are a helpful assistant for job seekers and career advancers.
@@ -338,6 +824,11 @@ def generate_text_response(query: str, conversation_history=None) -> str:
     Refer to previous information that the user has shared when appropriate.
     """
     
+    # Without history the answer depends only on the query, so it is cached (run_agent
+    # looks it up before classifying, so a wrongly cached answer would hide the job
+    # and roadmap paths for similar prompts)
+    cacheable = SEMANTIC_CACHE_ENABLED and cache and not conversation_history
+    
     messages = [
         SystemMessage(content=system_prompt),
     ]
@@ -362,11 +853,15 @@ def generate_text_response(query: str, conversation_history=None) -> str:
     else:
         messages.append(HumanMessage(content=query))
     
-    response = chat_model(messages)
-    return response.content.strip()
+    response = invoke_chat_model(messages, "text", fallback=CANNED_TEXT_REPLY)
+    text = response.content.strip()
+    # A degraded turn (history or classification fell back) is not trusted either
+    if cacheable and text != CANNED_TEXT_REPLY and not is_degraded():
+        text_response_cache.add(query, text)
+    return text
 
 # Format the response for the frontend
-def format_response(query_type: str, query: str, result) -> dict:
+def format_response(query_type: str, query: str, result, job_view=JOB_VIEW_FIELDS) -> dict:
     """
     Format the response based on the query type.
     Returns a dictionary in the format expected by the frontend.
@@ -375,24 +870,41 @@ def format_response(query_type: str, query: str, result) -> dict:
         # Job search response
         job_params = result
         
-        # Get fresh token for job API
-        token = get_herkey_token()
-        
         # Create query string for job_link
         query_string = urllib.parse.urlencode(job_params)
         base_url = "https://api-prod.herkey.com/api/v1/herkey/jobs/es_candidate_jobs"
         job_link = f"{base_url}?{query_string}"
         
-        # Actually fetch the job search results here
-        jobs_data = get_job_search_results(job_params)
-        job_count = len(jobs_data.get("body", []))
+        # Actually fetch the job search results here (page 1 is cached and page 2 prefetched)
+        search_id = register_job_search(job_params)
+        page_no = job_params.get("page_no", 1)
+        try:
+            jobs_data = get_job_page(search_id, page_no, job_params.get("page_size", JOB_PAGE_SIZE), job_view)
+        except Exception as e:
+            print(f"Job results unavailable, sending the search link only: {str(e)}")
+            jobs_data = {"error": str(e)}
+        if jobs_data is None or "error" in jobs_data:
+            # Out of time (or HerKey is failing, with no stale copy): send the params and
+            # link without inline results; the client then fetches them itself from job_link
+            mark_degraded("job_results")
+            jobs_data = None
+
+        # Get fresh token for job API; a failed mint does not cost the results above
+        try:
+            token = get_herkey_token()
+        except Exception as e:
+            print(f"Could not mint a HerKey token for the job API: {str(e)}")
+            token = None
+        job_count = len(jobs_data.get("body", [])) if jobs_data else 0
         
         # Create a more human-like response based on the search parameters
         location = job_params.get("location_name", "")
         role = job_params.get("keyword", "jobs")
         
         # Create a natural language response based on search results
-        if job_count > 0:
+        if jobs_data is None:
+            response_text = f"I've set up a search for {role} openings{f' in {location}' if location else ''}. Open the results to see the matches."
+        elif job_count > 0:
             if location:
                 response_text = f"I found {job_count} {role} opportunities in {location}! Here are some matches that might interest you."
             else:
@@ -403,15 +915,23 @@ def format_response(query_type: str, query: str, result) -> dict:
             else:
                 response_text = f"I couldn't find exact matches for '{role}'"
         
+        canvas_utils = {
+            "param": job_params,
+            "job_link": job_link,
+            "job_api": token,  # Include the actual token value
+            "search_id": search_id,  # Pass to /api/jobs to page through results
+            # Without inline results the client starts from the current page
+            "next_cursor": page_no if jobs_data is None else (page_no + 1 if job_count > 0 else None)
+        }
+        # The canvas treats any job_results array as final, so it is left out when
+        # the results could not be fetched and the canvas falls back to job_link
+        if jobs_data is not None:
+            canvas_utils["job_results"] = jobs_data.get("body", [])  # Include actual job results
+
         return {
             "text": response_text,
             "canvasType": "job_search",
-            "canvasUtils": {
-                "param": job_params,
-                "job_link": job_link,
-                "job_api": token,  # Include the actual token value
-                "job_results": jobs_data.get("body", [])  # Include actual job results
-            }
+            "canvasUtils": canvas_utils
         }
     
     elif query_type == "roadmap":
@@ -428,16 +948,17 @@ def format_response(query_type: str, query: str, result) -> dict:
     elif query_type == "events":
         # Events response
         
-        session_link,session_api=get_events_links()
-        
+        # Sessions are fetched server-side and sent inline, so the browser makes no second hop
+        session_link, session_results = get_events_links()
+        canvas_utils = {"session_link": session_link}
+        # Without results the canvas falls back to fetching session_link itself
+        if session_results is not None:
+            canvas_utils["session_results"] = session_results
         
         return {
             "text": "I can help you find events or workshops related to your query. Please click on the toggle to view",
             "canvasType": "sessions",
-            "canvasUtils": {
-                "session_link":session_link,
-                "session_api":session_api# Placeholder for events data
-            }
+            "canvasUtils": canvas_utils
         }
         
     else:
@@ -448,45 +969,165 @@ def format_response(query_type: str, query: str, result) -> dict:
             "canvasUtils": {}
         }
 
-def run_agent(prompt: str, conversation_history=None) -> dict:
-    """
-    Process a user prompt and return an appropriate response.
-    Returns a dictionary in the format expected by the frontend.
-    
-    Args:
-        prompt (str): The user's current query/message
-        conversation_history (list, optional): Previous conversation messages for context
-    """
-    # Step 1: Classify the query
-    query_type = classify_query(prompt)
-    
-    # Step 2: Handle based on classification
+def run_intent(query_type: str, prompt: str, conversation_history=None, user_profile=None, job_view=JOB_VIEW_FIELDS, cache_text=False) -> dict:
+    """Run the sub-agent for one intent and format its response (cache_text: see generate_text_response)."""
+    user_profile = user_profile or {}
     if query_type == "job_search":
         # Handle job search
         job_params = extract_job_search_params(prompt, conversation_history)
-        return format_response(query_type, prompt, job_params)
+        job_params = personalize_job_params(job_params, user_profile)
+        return format_response(query_type, prompt, job_params, job_view)
     
     elif query_type == "roadmap":
         # Handle roadmap
-        roadmap_items = generate_roadmap(prompt, conversation_history)
+        roadmap_items = generate_roadmap(prompt, conversation_history, user_profile.get("professionalStage"))
         return format_response(query_type, prompt, roadmap_items)
     
+    elif query_type == "events":
+        # Handle events (no text generation needed)
+        return format_response(query_type, prompt, None)
+    
     else:
         # Handle normal text
-        text_response = generate_text_response(prompt, conversation_history)
+        text_response = generate_text_response(prompt, conversation_history, cache=cache_text)
         return format_response(query_type, prompt, text_response)
 
-def get_events_links():
+# Compound requests run their sub-agents concurrently, so a turn takes as long as its slowest part
+_intent_executor = ThreadPoolExecutor(max_workers=int(os.getenv("INTENT_WORKERS", "8")), thread_name_prefix="agent-intent")
+INTENT_FAILED_TEXT = {
+    "job_search": "I couldn't search for jobs just now.",
+    "roadmap": "I couldn't build the roadmap just now.",
+    "events": "I couldn't load events just now.",
+    "normal_text": CANNED_TEXT_REPLY,
+}
+
+def merge_responses(responses: list) -> dict:
+    """
+    Merge sub-agent responses into one: every part's text, and the first canvas
+    (the client shows one canvas per message).
+    """
+    canvases = [r for r in responses if r.get("canvasType") != "none"]
+    primary = canvases[0] if canvases else responses[0]
+    return {
+        "text": "\n\n".join(r["text"] for r in responses if r.get("text")),
+        "canvasType": primary["canvasType"],
+        "canvasUtils": primary["canvasUtils"],
+    }
+
+def run_agent(prompt: str, conversation_history=None, user_profile=None, job_view=JOB_VIEW_FIELDS) -> dict:
     """
-    Get the session link and API token for events.
-    Returns a tuple of (session_link, session_api).
+    Process a user prompt and return an appropriate response.
+    Returns a dictionary in the format expected by the frontend.
+    
+    Args:
+        prompt (str): The user's current query/message
+        conversation_history (list, optional): Previous conversation messages for context
+        user_profile (dict, optional): The user's stored profile, used for personalization
+        job_view (dict, optional): Projection spec for job results (None sends full jobs)
     """
-    # Placeholder for actual implementation to get events links
-    # For now, return dummy values
-    session_link = "https://api-prod.herkey.com/api/v1/herkey/sessions/get-session-widgets?category=Featured"
-    session_api = get_herkey_token()
+    # Step 1: A context-free question answered before skips classification and generation
+    if SEMANTIC_CACHE_ENABLED and not conversation_history:
+        cached = text_response_cache.lookup(prompt)
+        if cached is not None:
+            return format_response("normal_text", prompt, cached)
+
+    # Step 2: Classify the query (one message may carry several requests)
+    intents = classify_intents(prompt)
     
-    return session_link, session_api
+    # Step 3: Handle based on classification
+    if len(intents) == 1:
+        intent = intents[0]
+        return run_intent(intent["intent"], prompt, conversation_history, user_profile, job_view, cache_text=not intent.get("fallback"))
+
+    futures = [
+        tracer.submit(_intent_executor, run_intent, i["intent"], i["query"], conversation_history, user_profile, job_view)
+        for i in intents
+    ]
+    responses = []
+    for intent, future in zip(intents, futures):
+        try:
+            responses.append(wait_for(future))
+        except Exception as e:
+            # One failed (or late) part does not lose the others. A late part that has
+            # not started is cancelled; a running one stops at its next stage, which
+            # takes its timeout from the same (now spent) budget
+            future.cancel()
+            print(f"Sub-agent {intent['intent']} failed: {str(e)}")
+            mark_degraded(intent["intent"])
+            responses.append(format_response("normal_text", intent["query"], INTENT_FAILED_TEXT[intent["intent"]]))
+    return merge_responses(responses)
+
+# Events / sessions
+SESSION_WIDGETS_URL = f"{Config.HERKEY_API_BASE_URL}/sessions/get-session-widgets"
+events_cache = TTLCache(maxsize=50, ttl=int(os.getenv("EVENTS_TTL", "600")))
+
+# The parts of a session widget that SessionCanvas renders; everything else is dropped
+SESSION_VIEW_FIELDS = {
+    "post_id": True,
+    "discussion_id": True,
+    "status": True,
+    "post_info": {
+        "post_id": True,
+        "user_short_profile": {"username": True},
+    },
+    "post_content": {
+        "post_topic_text": True,
+        "discussion_post_image_url": True,
+        "discussion_start_date_time": True,
+        "discussion_end_date_time": True,
+        "duration": True,
+        "categories": True,
+        "interested_participants": {"participants_count": True},
+        "discussion_url": True,
+        "external_url": True,
+        "youtube_url": True,
+    },
+}
+
+def get_session_widgets(category: str = "Featured") -> list:
+    """
+    Fetch HerKey session widgets for a category with the shared token.
+    Results are trimmed to SESSION_VIEW_FIELDS and cached per category.
+    """
+    sessions = events_cache.get(category)
+    if sessions is not None:
+        return sessions
+    # Concurrent cache misses for a category share one fetch
+    return herkey_flight.do(make_key("session-widgets", category), _fetch_session_widgets, category)
+
+def _fetch_session_widgets(category: str) -> list:
+    resp = None
+    for refresh in (False, True):
+        resp = hedged_get(
+            breakers["herkey"],
+            SESSION_WIDGETS_URL,
+            params={"category": category},
+            headers={"Authorization": f"Token {get_shared_herkey_token(refresh=refresh)}"},
+        )
+        # A rejected token is re-minted once
+        if resp.status_code not in (401, 403):
+            break
+    resp.raise_for_status()
+
+    sessions = [project_fields(session, SESSION_VIEW_FIELDS) for session in resp.json().get("body") or []]
+    events_cache.set(category, sessions)
+    return sessions
+
+def get_events_links(category: str = "Featured"):
+    """
+    Get the public session link for a category.
+    Returns a tuple of (session_link, session_results) where session_results is
+    None if the sessions could not be fetched.
+    """
+    session_link = f"{SESSION_WIDGETS_URL}?{urllib.parse.urlencode({'category': category})}"
+    try:
+        session_results = get_session_widgets(category)
+    except Exception as e:
+        print(f"Error fetching sessions: {str(e)}")
+        mark_degraded("events")
+        session_results = None
+
+    return session_link, session_results
 
 
 # Example usage
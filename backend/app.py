@@ -1,39 +1,63 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, stream_with_context, send_file
 from flask_cors import CORS
-import time
 import requests
 import urllib.parse
 import uuid
-import requests
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from bson import ObjectId
 import os
 import jwt
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
 import PyPDF2
 import docx2txt
-import nltk
-from nltk.tokenize import word_tokenize
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 # Import your internal logic
-from agent import run_agent  # Your run_agent logic
-from db import create_user, authenticate_user, get_user_by_id, save_conversation, get_user_conversations
+from agent import (
+    run_agent, register_job_search, get_job_page, JOB_PAGE_SIZE, get_session_widgets, text_response_cache,
+    job_view_spec, job_view_snapshot, stream_roadmap, format_response, roadmap_stats, job_param_stats,
+)
+from db import create_user, authenticate_user, get_user_by_id, save_conversation, get_user_conversations, get_conversation_page, get_conversation_version, conversation_etag
+from config.config import Config
+from job_mirror import job_mirror
 
 from dotenv import load_dotenv
 load_dotenv()
 
 # LangChain, Tavily, Cohere imports
-from langchain_cohere import ChatCohere
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 # Import profanity check functions
 from profanity import check_profanity, get_profanity_response
+from singleflight import llm_flight, search_flight, make_key, singleflight_stats
+from resilience import breakers, resilience_stats
+from llm_router import llm_router
+from middleware import admission_control, admin_required, JWT_SECRET_KEY, JWT_ALGORITHM
+from rate_limit import rate_limiter
+from profile_cache import make_profile_cache
+from cache import TTLCache
+from interview import InterviewPlan
+from passwords import password_hasher, PasswordPoolBusy
+from storage import upload_storage, UploadTooLarge, UPLOAD_MAX_BYTES
+from json_provider import FastJSONProvider
+from compression import init_compression
+from profiler import init_profiling, list_profiles, profile_path
+from tracing import tracer, traced_request
+from skills import skill_index
+from deadline import deadline, time_left, expired, mark_degraded, HTTP_TIMEOUT, STREAM_DEADLINE
 
 app = Flask(__name__)
+# orjson-backed JSON (ObjectId/datetime aware) and gzip/brotli for large responses
+app.json_provider_class = FastJSONProvider
+app.json = FastJSONProvider(app)
+init_compression(app)
+# Opt-in sampling profiles of slow requests (see profiler.py)
+init_profiling(app)
 
 # Fix CORS for local dev and production (Render backend, Vercel frontend)
 CORS(app,
@@ -49,18 +73,28 @@ CORS(app,
 
 app.secret_key = os.getenv("SECRET_KEY", "herkey-secret-key-change-in-production")
 
+# Keep a local mirror of active HerKey listings for instant job search
+if Config.JOB_MIRROR_ENABLED:
+    job_mirror.start()
+
 client = MongoClient(os.getenv('MONGODB_URI'))
 db = client.askasha_db
 
-# Configure upload folder
-UPLOAD_FOLDER = 'uploads'
+# Profiles are read on most requests; writes below invalidate the cached copy
+profile_cache = make_profile_cache(db.users)
+
+# Uploads are kept in upload_storage (see storage.py); upload requests larger than
+# the upload limit plus room for the form fields are rejected before parsing
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+UPLOAD_REQUEST_MAX_BYTES = UPLOAD_MAX_BYTES + 64 * 1024
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def upload_extension(filename):
+    """The extension of an allowed upload, taken from the sanitized name; None if not allowed."""
+    name = secure_filename(filename)
+    if '.' not in name:
+        return None
+    extension = name.rsplit('.', 1)[1].lower()
+    return extension if extension in ALLOWED_EXTENSIONS else None
 
 # External API keys
 os.environ["TAVILY_API_KEY"] = os.getenv("TAVILY_API_KEY")  # Replace with your actual API key
@@ -70,11 +104,8 @@ internet_search = TavilySearchResults()
 internet_search.name = "internet_search"
 internet_search.description = "Returns a list of relevant document snippets for a textual query retrieved from the internet."
 
-llm = ChatCohere(
-    cohere_api_key=os.getenv("COHERE_API_KEY"),
-    model="command-r-plus",
-    temperature=0.3
-)
+# Coach and interview calls are routed per task (see llm_router.TASK_ROUTES); this is the default model
+llm = llm_router.get_model("command-r-plus")
 
 # Session storage for mock interview/career chats
 sessions = {}
@@ -123,164 +154,146 @@ At the end of the interview, rate the user based on their performance and provid
 
 # -------------- Helper Functions -------------- #
 def get_session_id():
-    """Get a session ID from HerKey API"""
-    response = requests.get('https://api-prod.herkey.com/api/v1/herkey/generate-session')
-    if response.status_code == 200:
-        return response.json()['body']['session_id']
+    """Get a session ID from HerKey API (None if it fails or the request is out of time)"""
+    try:
+        response = requests.get('https://api-prod.herkey.com/api/v1/herkey/generate-session', timeout=time_left(HTTP_TIMEOUT))
+        if response.status_code == 200:
+            return response.json()['body']['session_id']
+    except Exception as e:
+        print(f"Error getting HerKey session: {str(e)}")
+    mark_degraded("session")
     return None
 
+CANNED_COACH_REPLY = "I'm having trouble responding right now. Please try again in a moment."
+
+# Popular coaching searches repeat across users; results are cached by normalized query
+search_cache = TTLCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "500")),
+    ttl=int(os.getenv("SEARCH_CACHE_TTL", "21600")),
+)
+search_cache_stats = {"hits": 0, "misses": 0}
+MAX_SNIPPETS = 5
+MAX_SNIPPET_CHARS = 300
+MAX_SEARCH_CONTEXT_CHARS = 1500
+
+def normalize_query(query):
+    """Lowercase, strip punctuation/quotes and collapse whitespace so equivalent queries share a key"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
 def search_online(query):
-    """Search using Tavily"""
-    return internet_search.invoke({"query": query})
-
-#SKILL PARSING FUNCTION
-nltk.download('punkt')
-
-# Define skills database
-SKILL_PATTERNS = {
-    # Programming Languages
-    'languages': [
-        'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'ruby', 'php', 'go', 'rust',
-        'scala', 'kotlin', 'swift', 'objective-c', 'r', 'matlab', 'perl', 'bash', 'shell', 'sql',
-        'html', 'css', 'xml', 'yaml', 'json'
-    ],
-    
-    # Frameworks & Libraries
-    'frameworks': [
-        'react', 'angular', 'vue', 'node.js', 'express', 'django', 'flask', 'spring', 'asp.net',
-        'laravel', 'ruby on rails', 'jquery', 'bootstrap', 'tailwind', 'next.js', 'gatsby',
-        'tensorflow', 'pytorch', 'keras', 'scikit-learn', 'pandas', 'numpy', 'scipy', 'matplotlib'
-    ],
-    
-    # Databases
-    'databases': [
-        'sql', 'mysql', 'postgresql', 'mongodb', 'sqlite', 'oracle', 'redis', 'dynamodb',
-        'firebase', 'cassandra', 'elasticsearch', 'neo4j', 'nosql'
-    ],
-    
-    # DevOps & Cloud
-    'devops': [
-        'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins', 'ci/cd', 'terraform',
-        'ansible', 'git', 'github', 'gitlab', 'bitbucket', 'jira', 'agile', 'scrum'
-    ],
-    
-    # Mobile Development
-    'mobile': [
-        'android', 'ios', 'react native', 'flutter', 'xamarin', 'swift', 'kotlin',
-        'mobile development', 'app development'
-    ],
-    
-    # Soft Skills
-    'soft_skills': [
-        'problem solving', 'teamwork', 'communication', 'leadership', 'time management',
-        'project management', 'critical thinking', 'analytical skills', 'adaptability'
-    ],
-    
-    # Data Science & Machine Learning
-    'data_science': [
-        'machine learning', 'deep learning', 'neural networks', 'data analysis', 'data visualization',
-        'big data', 'hadoop', 'spark', 'nlp', 'computer vision', 'ai', 'artificial intelligence',
-        'data mining', 'statistical analysis', 'business intelligence', 'a/b testing'
-    ],
-    
-    # Design
-    'design': [
-        'ui/ux', 'graphic design', 'adobe photoshop', 'adobe illustrator', 'figma', 'sketch',
-        'responsive design', 'wireframing', 'prototyping'
-    ]
-}
+    """Search using Tavily (cached; identical concurrent queries share one call)"""
+    normalized = normalize_query(query)
+    with tracer.span("tavily.search") as span:
+        results = search_cache.get(normalized)
+        span.set(cached=results is not None)
+        if results is not None:
+            search_cache_stats["hits"] += 1
+            return results
+        search_cache_stats["misses"] += 1
+        results = search_flight.do(normalized, breakers["tavily"].call, internet_search.invoke, {"query": query})
+        span.set(results=len(results) if isinstance(results, list) else None)
+        search_cache.set(normalized, results)
+    return results
+
+def trim_snippets(search_results):
+    """
+    Turn search results into a short, de-duplicated list of snippets so the
+    search context adds a bounded number of tokens to the prompt.
+    """
+    snippets = []
+    seen = set()
+    total = 0
+    for result in search_results or []:
+        if isinstance(result, dict):
+            text = result.get("content") or ""
+        else:
+            text = result.metadata.get("snippet") or result.page_content
+        text = " ".join(text.split())
+        if not text or text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        if len(text) > MAX_SNIPPET_CHARS:
+            text = text[:MAX_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+        if total + len(text) > MAX_SEARCH_CONTEXT_CHARS:
+            break
+        snippets.append(text)
+        total += len(text)
+        if len(snippets) == MAX_SNIPPETS:
+            break
+    return snippets
+
+SEARCH_ACTION = re.compile(r"Action:\s*Search\[(.*?)\]", re.IGNORECASE)
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
+
+def stream_reply_with_early_search(messages):
+    """
+    Stream the coach reply and start the internet search as soon as the model
+    emits `Action: Search[...]`, instead of waiting for the whole completion.
+    Returns (reply, search_query, search_future); the rest of the stream is not
+    read once a search starts, since the reply is regenerated with its results.
+    """
+    reply = ""
+    try:
+        for chunk in llm_router.stream("coach", messages):
+            reply += chunk.content
+            match = SEARCH_ACTION.search(reply)
+            if match:
+                search_query = match.group(1)
+                return reply.strip(), search_query, tracer.submit(_search_executor, search_online, search_query)
+    except Exception as e:
+        print(f"LLM stream failed for coach: {str(e)}")
+    return reply.strip() or CANNED_COACH_REPLY, None, None
 
-# Create a flat list of all skills
-ALL_SKILLS = []
-for category, skills in SKILL_PATTERNS.items():
-    ALL_SKILLS.extend(skills)
-
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
-    with open(file_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-
-def extract_text_from_docx(file_path):
-    """Extract text from DOCX file"""
-    return docx2txt.process(file_path)
-
-def extract_text_from_txt(file_path):
-    """Extract text from plain text file"""
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        return file.read()
-
-def extract_text_from_file(file_path):
-    """Extract text from various file formats"""
-    file_extension = file_path.split('.')[-1].lower()
-    
+def invoke_llm(messages, task="coach"):
+    """Invoke the best model for a coach/interview task through the LLM router, sharing one call
+    between identical concurrent requests. Falls back to a canned reply when every model fails."""
+    key = make_key(task, [(message.type, message.content) for message in messages])
+    try:
+        return llm_flight.do(key, llm_router.invoke, task, messages)
+    except Exception as e:
+        print(f"LLM call for {task} failed, using fallback: {str(e)}")
+        return AIMessage(content=CANNED_COACH_REPLY)
+
+def extract_text_from_pdf(file):
+    """Extract text from a PDF file object"""
+    reader = PyPDF2.PdfReader(file)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+def extract_text_from_docx(file):
+    """Extract text from a DOCX file object"""
+    return docx2txt.process(file)
+
+def extract_text_from_txt(file):
+    """Extract text from a plain text file object"""
+    return file.read().decode('utf-8', errors='ignore')
+
+def extract_text_from_stream(file, file_extension):
+    """Extract text from a binary file object of the given format"""
     if file_extension == 'pdf':
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file)
     elif file_extension == 'docx':
-        return extract_text_from_docx(file_path)
+        return extract_text_from_docx(file)
     elif file_extension == 'txt':
-        return extract_text_from_txt(file_path)
+        return extract_text_from_txt(file)
     else:
         return ""
 
 def extract_skills_from_text(text):
-    """Extract skills from text using nltk and pattern matching"""
-    # Tokenize the text into words
-    words = word_tokenize(text.lower())
-    
-    skills_found = set()
-    
-    # Check if each word is a skill from our skill list
-    for word in words:
-        if word in ALL_SKILLS:
-            skills_found.add(word)
-    
-    # Also look for skills mentioned in lists and bullet points
-    bullet_pattern = r'(?:•|\*|\-|\d+\.)?\s*([A-Za-z0-9][\w\+\#\.\s]+)(?:,|\.|;|$)'
-    for match in re.finditer(bullet_pattern, text.lower()):
-        item = match.group(1).strip()
-        # Check if this item contains any of our skills
-        for skill in ALL_SKILLS:
-            if re.search(r'\b' + re.escape(skill) + r'\b', item):
-                skills_found.add(skill)
-    
-    # Format skills with proper capitalization
-    formatted_skills = []
-    for skill in skills_found:
-        # Special case for acronyms
-        if skill.upper() in ['HTML', 'CSS', 'SQL', 'PHP', 'AWS', 'GCP', 'API', 'AI', 'ML', 'NLP']:
-            formatted_skills.append(skill.upper())
-        else:
-            # Capitalize first letter of each word
-            formatted_skills.append(' '.join(word.capitalize() for word in skill.split()))
-    
-    # Categorize skills
-    categorized_skills = {}
-    for skill in skills_found:
-        for category, category_skills in SKILL_PATTERNS.items():
-            if skill in category_skills:
-                if category not in categorized_skills:
-                    categorized_skills[category] = []
-                
-                # Add with proper formatting
-                if skill.upper() in ['HTML', 'CSS', 'SQL', 'PHP', 'AWS', 'GCP', 'API', 'AI', 'ML', 'NLP']:
-                    categorized_skills[category].append(skill.upper())
-                else:
-                    categorized_skills[category].append(' '.join(word.capitalize() for word in skill.split()))
-                break
-    
+    """Extract skills from text with the shared skill taxonomy (aliases count as their skill)"""
+    skills_found = skill_index.find(text)
     return {
-        "skills": sorted(formatted_skills),
-        "categorized_skills": categorized_skills
+        "skills": sorted(skill_index.display(skill) for skill in skills_found),
+        "categorized_skills": skill_index.categorize(skills_found)
     }
 
-def parse_resume(file_path):
-    """Main function to parse resume and extract skills"""
-    # Extract text from the file
-    text = extract_text_from_file(file_path)
+def parse_resume(key):
+    """Main function to parse a stored resume and extract skills"""
+    # Read the text straight from storage
+    with upload_storage.open(key) as file:
+        text = extract_text_from_stream(file, key.split('.')[-1].lower())
     
     # Extract skills from the text
     skills_data = extract_skills_from_text(text)
@@ -292,10 +305,38 @@ def parse_resume(file_path):
 def health_check():
     return jsonify({"status": "ok", "message": "Server is running"})
 
-# -------------- Authentication Routes -------------- #
-JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
-JWT_ALGORITHM = 'HS256'
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "singleflight": singleflight_stats(),
+        "semantic_cache": dict(text_response_cache.stats),
+        **resilience_stats(),
+        "llm_router": llm_router.snapshot(),
+        "rate_limit": rate_limiter.snapshot(),
+        "profile_cache": dict(profile_cache.stats),
+        "search_cache": {**search_cache_stats, "size": len(search_cache)},
+        "password_pool": password_hasher.snapshot(),
+        "job_view": job_view_snapshot(),
+        "roadmap_items": dict(roadmap_stats),
+        "job_params": dict(job_param_stats),
+        "tracing": dict(tracer.stats)
+    })
+
+# -------------- Admin: Profiles -------------- #
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def admin_list_profiles():
+    return jsonify({"profiles": list_profiles()})
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def admin_get_profile(name):
+    path = profile_path(name)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(os.path.abspath(path), mimetype='text/plain', as_attachment=True, download_name=name)
 
+# -------------- Authentication Routes -------------- #
 @app.route('/api/signup', methods=['POST'])
 def signup():
     data = request.get_json()
@@ -304,7 +345,10 @@ def signup():
     if not username or not email or not password:
         return jsonify({"status": "error", "message": "Missing fields"}), 400
 
-    user_id = create_user(username, email, password)
+    try:
+        user_id = create_user(username, email, password)
+    except PasswordPoolBusy:
+        return jsonify({"status": "error", "message": "Too many sign-ins right now, please retry"}), 503, {"Retry-After": "2"}
     if user_id:
         session['user_id'] = user_id
         # Generate JWT token
@@ -321,7 +365,10 @@ def login():
     if not email or not password:
         return jsonify({"status": "error", "message": "Missing fields"}), 400
 
-    user_id = authenticate_user(email, password)
+    try:
+        user_id = authenticate_user(email, password)
+    except PasswordPoolBusy:
+        return jsonify({"status": "error", "message": "Too many sign-ins right now, please retry"}), 503, {"Retry-After": "2"}
     if user_id:
         session['user_id'] = user_id
         # Generate JWT token
@@ -354,18 +401,49 @@ def get_conversations():
     if not user_id:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
-    conversations = get_user_conversations(user_id)
-    return jsonify({"status": "success", "conversations": conversations})
+    cursor = request.args.get('cursor')
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid limit"}), 400
+    if not 1 <= limit <= 50:
+        return jsonify({"status": "error", "message": "Invalid limit"}), 400
+
+    # A cached version answers a matching If-None-Match without querying Mongo
+    version = get_conversation_version(user_id, cached_only=True)
+    if version is not None:
+        etag = conversation_etag(user_id, version, cursor, limit)
+        # Compressed responses carry the tag weakened (W/"..."), so compare weakly
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+    try:
+        conversations, next_cursor = get_conversation_page(user_id, limit, cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        print(f"Error retrieving conversations: {e}")
+        return jsonify({"status": "success", "conversations": [], "next_cursor": None})
+
+    response = jsonify({"status": "success", "conversations": conversations, "next_cursor": next_cursor})
+    response.set_etag(conversation_etag(user_id, get_conversation_version(user_id), cursor, limit))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @app.route('/api/check-user', methods=['POST'])
 def check_user():
     data = request.json
-    user = db.users.find_one({'uid': data['uid']})
+    user = profile_cache.get(data['uid'])
     return jsonify({'exists': bool(user)})
 
 @app.route('/api/create-profile', methods=['POST'])
 def create_profile():
     try:
+        # Only this route takes uploads, so only it gets the larger body limit
+        request.max_content_length = UPLOAD_REQUEST_MAX_BYTES
         # Get form data
         data = request.form.to_dict()
         uid = data.pop('uid', None)
@@ -384,16 +462,20 @@ def create_profile():
         
         if 'resume' in request.files and request.files['resume'].filename:
             resume_file = request.files['resume']
-            if allowed_file(resume_file.filename):
-                try:
-                    filename = secure_filename(f"{uid}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{resume_file.filename}")
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    resume_file.save(filepath)
-                    
-                    # Parse resume and extract skills
-                    skills_data = parse_resume(filepath)
-                except Exception as e:
-                    print(f"Error saving or parsing resume: {str(e)}")
+            extension = upload_extension(resume_file.filename)
+            if extension is None:
+                return jsonify({'error': 'Resume must be a PDF, DOC or DOCX file', 'status': 'error'}), 400
+            try:
+                # Stored under its content hash, so re-uploads of the same file are kept once
+                stored = upload_storage.save(resume_file.stream, extension)
+                filename = stored.key
+                
+                # Parse resume and extract skills
+                skills_data = parse_resume(filename)
+            except UploadTooLarge as e:
+                return jsonify({'error': str(e), 'status': 'error'}), 413
+            except Exception as e:
+                print(f"Error saving or parsing resume: {str(e)}")
         
         # Create user profile
         profile_data = {
@@ -418,10 +500,13 @@ def create_profile():
             {'$set': profile_data},
             upsert=True
         )
+        profile_cache.invalidate(uid)
         
         print(f"Profile created successfully for uid: {uid}")
         return jsonify({'message': 'Profile created successfully', 'status': 'success'}), 201
 
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Upload exceeds {UPLOAD_MAX_BYTES} bytes', 'status': 'error'}), 413
     except Exception as e:
         print(f"Error creating profile: {str(e)}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
@@ -434,6 +519,7 @@ def update_profile(uid):
             {'uid': uid},
             {'$set': data}
         )
+        profile_cache.invalidate(uid)
         if result.modified_count:
             return jsonify({'message': 'Profile updated successfully'})
         return jsonify({'error': 'User not found'}), 404
@@ -443,9 +529,8 @@ def update_profile(uid):
 @app.route('/api/profile/<uid>', methods=['GET'])
 def get_profile(uid):
     try:
-        user = db.users.find_one({'uid': uid})
+        user = profile_cache.get(uid)
         if user:
-            user['_id'] = str(user['_id'])  # Convert ObjectId to string
             return jsonify(user)
         return jsonify({'error': 'User not found'}), 404
     except Exception as e:
@@ -456,6 +541,7 @@ def get_profile(uid):
 def delete_profile(uid):
     try:
         result = db.users.delete_one({'uid': uid})
+        profile_cache.invalidate(uid)
         if result.deleted_count:
             return jsonify({'message': 'Profile deleted successfully'})
         return jsonify({'error': 'User not found'}), 404
@@ -463,7 +549,14 @@ def delete_profile(uid):
         return jsonify({'error': str(e)}), 500
     
 # -------------- Chat via run_agent (HerKey Chatbot) -------------- #
+def requested_job_view():
+    """Job fields for this request: ?full=true for raw HerKey jobs, ?fields=id,title,... for a
+    custom set, otherwise the compact job view"""
+    return job_view_spec(request.args.get('fields'), request.args.get('full', '').lower() == 'true')
+
 @app.route('/api/chat', methods=['POST'])
+@traced_request('chat')
+@admission_control
 def chat():
     data = request.get_json()
     message = data.get('message', '')
@@ -474,30 +567,137 @@ def chat():
 
     is_authenticated = bool(user_id)
 
-    conversation_history = []
-    if is_authenticated:
-        conversation_history = get_user_conversations(user_id, limit=5)
-        conversation_history.reverse()  # chronological order
-
-    response = run_agent(message, conversation_history)
-
-    if response.get('canvasType') == 'job_search':
-        session_id = get_session_id()
-        params = response.get('canvasUtils', {}).get('param', {})
-        if session_id:
-            params['session_id'] = session_id
-
-        query_string = urllib.parse.urlencode(params)
-        job_url = f"https://api-prod.herkey.com/api/v1/herkey/jobs/es_candidate_jobs?{query_string}"
-        response['canvasUtils']['job_link'] = job_url
-        response['canvasUtils']['job_api'] = session_id
+    # Every stage below takes its timeout from one budget; stages that run out
+    # answer with a fallback and the response is flagged as degraded
+    with deadline() as budget:
+        conversation_history = []
+        user_profile = None
+        if is_authenticated:
+            conversation_history = get_user_conversations(user_id, limit=5)
+            conversation_history.reverse()  # chronological order
+            user_profile = profile_cache.get(user_id)
+
+        response = run_agent(message, conversation_history, user_profile, requested_job_view())
+
+        if response.get('canvasType') == 'job_search':
+            session_id = get_session_id()
+            params = response.get('canvasUtils', {}).get('param', {})
+            if session_id:
+                params['session_id'] = session_id
+
+            query_string = urllib.parse.urlencode(params)
+            job_url = f"https://api-prod.herkey.com/api/v1/herkey/jobs/es_candidate_jobs?{query_string}"
+            response['canvasUtils']['job_link'] = job_url
+            response['canvasUtils']['job_api'] = session_id
+
+    response['degraded'] = bool(budget.degraded)
+    if budget.degraded:
+        response['degraded_stages'] = list(budget.degraded)
 
     if is_authenticated:
         save_conversation(user_id, message, response)
 
-    time.sleep(0.5)
     return jsonify(response)
 
+# -------------- Job Paging (no LLM) -------------- #
+@app.route('/api/jobs', methods=['POST'])
+def list_jobs():
+    data = request.get_json() or {}
+    search_id = data.get('search_id')
+
+    # Clients without a search_id can resend the params from a previous turn
+    if not search_id and isinstance(data.get('params'), dict):
+        search_id = register_job_search(data['params'])
+    if not search_id:
+        return jsonify({"status": "error", "message": "search_id or params is required"}), 400
+
+    try:
+        page_no = int(data.get('cursor') or 1)
+        page_size = int(data.get('page_size') or JOB_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Invalid cursor or page_size"}), 400
+    if page_no < 1 or not 1 <= page_size <= 50:
+        return jsonify({"status": "error", "message": "Invalid cursor or page_size"}), 400
+
+    jobs_data = get_job_page(search_id, page_no, page_size, requested_job_view())
+    if jobs_data is None:
+        return jsonify({"status": "error", "message": "Search expired, please search again"}), 404
+    if "error" in jobs_data:
+        return jsonify({"status": "error", "message": jobs_data["error"]}), 502
+
+    jobs = jobs_data.get("body", [])
+    return jsonify({
+        "status": "success",
+        "search_id": search_id,
+        "page_no": page_no,
+        "jobs": jobs,
+        "next_cursor": page_no + 1 if jobs else None
+    })
+
+# -------------- Streaming Roadmap -------------- #
+@app.route('/api/roadmap/stream', methods=['POST'])
+@admission_control
+def roadmap_stream():
+    """
+    Stream a roadmap as NDJSON: one {"type": "item", "index", "item"} line per step
+    as soon as the model finishes it, then {"type": "done", "count", "degraded"}.
+    The stream is traced and bounded by STREAM_DEADLINE; items that have not
+    arrived by then are cut off and the done line says degraded.
+    """
+    data = request.get_json() or {}
+    message = data.get('message', '')
+    user_id = data.get('userId') or session.get('user_id')
+    if not message:
+        return jsonify({"status": "error", "message": "Message cannot be empty"}), 400
+
+    def generate():
+        # The trace and deadline live in the generator, which runs after the view has returned
+        with tracer.trace('roadmap_stream') as trace, deadline(STREAM_DEADLINE) as budget:
+            conversation_history = []
+            professional_stage = None
+            if user_id:
+                conversation_history = get_user_conversations(user_id, limit=5)
+                conversation_history.reverse()  # chronological order
+                professional_stage = (profile_cache.get(user_id) or {}).get('professionalStage')
+
+            items = []
+            roadmap = stream_roadmap(message, conversation_history, professional_stage)
+            try:
+                for item in roadmap:
+                    items.append(item)
+                    yield app.json.dumps({"type": "item", "index": len(items) - 1, "item": item}) + "\n"
+                    if expired():
+                        mark_degraded("roadmap")
+                        break
+                yield app.json.dumps({"type": "done", "count": len(items), "degraded": bool(budget.degraded)}) + "\n"
+            except GeneratorExit:
+                # The client went away; not an error in the trace
+                trace.root.set(items=len(items), client_disconnected=True)
+                return
+            finally:
+                # Stops the model's stream when we stop reading early
+                roadmap.close()
+            trace.root.set(items=len(items), degraded=list(budget.degraded))
+            if user_id:
+                save_conversation(user_id, message, format_response("roadmap", message, items))
+
+    response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Ask proxies not to buffer, so each line reaches the client as it is produced
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# -------------- Events / Sessions Proxy -------------- #
+@app.route('/api/events', methods=['GET'])
+def list_events():
+    category = request.args.get('category', 'Featured')
+    try:
+        sessions = get_session_widgets(category)
+    except Exception as e:
+        print(f"Error fetching sessions: {str(e)}")
+        return jsonify({"status": "error", "message": "Could not fetch sessions"}), 502
+    return jsonify({"status": "success", "category": category, "sessions": sessions})
+
 # -------------- LangChain Career Coach / Interview Bot -------------- #
 @app.route('/api/start-session', methods=['POST'])
 def start_session():
@@ -518,6 +718,8 @@ def start_session():
     return jsonify({"sessionId": session_id, "message": f"Started {chat_type} session"})
 
 @app.route('/api/send-message', methods=['POST'])
+@traced_request('send_message')
+@admission_control
 def send_message():
     data = request.json
     session_id = data.get('sessionId')
@@ -584,6 +786,8 @@ def send_message():
                 
                 session_data["skills"] = user_message
                 session_data["interview_stage"] = "start_interview"
+                # Plan the questions while the user gets ready
+                session_data["plan"] = InterviewPlan(session_data["role"], session_data["experience"], user_message)
                 # System prompt to guide the LLM
                 system_prompt = f"""
     ## Task and Context
@@ -598,37 +802,36 @@ def send_message():
             elif stage == "start_interview" and user_message.lower() in ["yes", "ready", "start"]:
                 session_data["interview_stage"] = "interviewing"  # Move to the actual interview stage
 
-                # Generate initial interview question
-                messages.append(HumanMessage(content="Generate an initial interview question based on the user's profile."))
-
-                response = llm.invoke(messages)
-                model_reply = response.content.strip()
+                # Serve the first planned question
+                question = session_data["plan"].next_question()["question"]
 
                 # Add question to memory
-                messages.append(AIMessage(content=model_reply))
+                messages.append(AIMessage(content=question))
 
-                return jsonify({"message": model_reply})
+                return jsonify({"message": question})
 
             elif stage == "interviewing":
                 messages.append(HumanMessage(content=user_message))
 
-                # Generate follow-up question based on user input
-                messages.append(HumanMessage(content="Generate a follow-up question based on the user's response. If the user response is satisfactory ask a different question. If the interview questions have covered all aspects to be asked about then start concluding the interview."))
+                # Serve a follow-up if the answer needs one, otherwise the next planned question
+                plan = session_data["plan"]
+                plan.record_answer(user_message)
+                question = plan.next_question()
+                if question is None:
+                    # This message answered the last question: reply with the feedback straight away
+                    session_data["interview_stage"] = "concluding"
+                    rating_reply = f"That was the last question. Here is your rating and feedback:\n\n{plan.feedback()}"
+                    messages.append(AIMessage(content=rating_reply))
+                    return jsonify({"message": rating_reply})
 
-                follow_up_response = llm.invoke(messages)
-                follow_up_reply = follow_up_response.content.strip()
+                messages.append(AIMessage(content=question["question"]))
 
-                messages.append(AIMessage(content=follow_up_reply))
-
-                return jsonify({"message": follow_up_reply})
+                return jsonify({"message": question["question"]})
 
             elif stage == "concluding":
-                # Provide interview rating and feedback
-                rating_messages = [
-                    HumanMessage(content="Please rate the user's performance on the interview based on their responses. Provide constructive feedback.")
-                ]
-                rating_response = llm.invoke(rating_messages)
-                rating_reply = rating_response.content.strip()
+                # Later messages get the same feedback: the scores recorded for each answer
+                rating_reply = session_data["plan"].feedback()
+                messages.append(AIMessage(content=rating_reply))
 
                 return jsonify({"message": rating_reply})
 
@@ -649,27 +852,23 @@ def send_message():
             messages.append(HumanMessage(content=user_message))
 
             try:
-                # Step 1: Let the model think
-                response = llm.invoke(messages)
-                model_reply = response.content.strip()
+                # Step 1: Let the model think (the search starts as soon as it asks for one)
+                model_reply, search_query, search_future = stream_reply_with_early_search(messages)
 
                 # Step 2: Check if model wants to search the internet
-                search_match = re.search(r"Action:\s*Search\[(.*?)\]", model_reply, re.IGNORECASE)
-
-                if search_match:
-                    search_query = search_match.group(1)
+                if search_future is not None:
                     print(f"🔎 Bot decided to search for: {search_query}")
 
                     try:
-                        search_results = internet_search.invoke({"query": search_query})
-                        snippets = "\n".join([doc.metadata['snippet'] for doc in search_results])
+                        search_results = search_future.result()
+                        snippets = "\n".join(trim_snippets(search_results))
 
                         # Feed back the search context
                         search_context = f"Here are search results for '{search_query}':\n{snippets}\n\nUse this to answer properly."
                         messages.append(HumanMessage(content=search_context))
 
                         # Re-invoke model with updated context
-                        response = llm.invoke(messages)
+                        response = invoke_llm(messages)
                         model_reply = response.content.strip()
 
                     except Exception as e:
@@ -0,0 +1,100 @@
+# benchmarks/json_payloads.py
+"""
+Compare JSON encoding and response compression on realistic chat payloads.
+
+Usage (from the backend folder):
+    python -m benchmarks.json_payloads
+    python -m benchmarks.json_payloads --jobs 50 --turns 20 --repeat 200
+
+"chat (view)" is the chat payload with jobs projected to the default job view.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from agent import JOB_VIEW_FIELDS, project_fields
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from json_provider import _default, orjson
+from tools.fake_herkey import make_jobs
+
+def chat_payload(job_count):
+    """A /api/chat job_search response as the agent builds it."""
+    jobs = make_jobs(job_count, seed=1)
+    for job in jobs:
+        job["company_logo"] = f"https://cdn.herkey.com/logos/{job['id']}.png"
+        job["description"] = "We are looking for a motivated professional to join our growing team. " * 6
+    return {
+        "type": "job_search",
+        "response": "Here are some jobs that match your search.",
+        "canvasType": "job_search",
+        "canvasUtils": {"job_results": jobs, "job_link": "https://www.herkey.com/jobs", "search_id": "a1b2c3d4e5f6a7b8"},
+    }
+
+def job_view_payload(payload):
+    """The same chat response with jobs projected to the default job view."""
+    jobs = [project_fields(job, JOB_VIEW_FIELDS) for job in payload["canvasUtils"]["job_results"]]
+    return {**payload, "canvasUtils": {**payload["canvasUtils"], "job_results": jobs}}
+
+def conversations_payload(turns, job_count):
+    """A /api/conversations response: stored turns with Mongo ids and timestamps."""
+    now = datetime.now()
+    return {"status": "success", "conversations": [
+        {
+            "_id": ObjectId(),
+            "user_id": "64f0c0ffee0000000000beef",
+            "message": "find python developer jobs in pune",
+            "response": chat_payload(job_count),
+            "timestamp": now - timedelta(minutes=i),
+        }
+        for i in range(turns)
+    ]}
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=15, help="jobs per response")
+    parser.add_argument("--turns", type=int, default=10, help="turns in the conversations payload")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    payloads = {"chat": chat_payload(args.jobs), "conversations": conversations_payload(args.turns, args.jobs)}
+    payloads["chat (view)"] = job_view_payload(payloads["chat"])
+    encoders = {
+        # What Flask's default provider does: sorted keys, ASCII escapes
+        "stdlib": lambda obj: json.dumps(obj, default=_default, sort_keys=True).encode("utf-8"),
+    }
+    if orjson is not None:
+        encoders["orjson"] = lambda obj: orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    print(f"{'payload':<14} {'encoder':<7} {'ms':>7} {'bytes':>8}")
+    for name, payload in payloads.items():
+        for encoder_name, encode in encoders.items():
+            ms, body = timed(lambda: encode(payload), args.repeat)
+            print(f"{name:<14} {encoder_name:<7} {ms:>7.3f} {len(body):>8}")
+
+    print(f"\n{'payload':<14} {'encoding':<10} {'ms':>7} {'bytes':>8} {'ratio':>6}")
+    for name, payload in payloads.items():
+        body = json.dumps(payload, default=_default).encode("utf-8")
+        compressors = {"gzip": lambda: gzip.compress(body, compresslevel=GZIP_LEVEL)}
+        if brotli is not None:
+            compressors["br"] = lambda: brotli.compress(body, quality=BROTLI_QUALITY)
+        print(f"{name:<14} {'identity':<10} {0:>7.3f} {len(body):>8} {1:>6.2f}")
+        for encoding, compress in compressors.items():
+            ms, compressed = timed(compress, args.repeat)
+            print(f"{name:<14} {encoding:<10} {ms:>7.3f} {len(compressed):>8} {len(body) / len(compressed):>6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/roadmap_prompt.py
+"""
+Compare the legacy all-persona roadmap prompt with the persona-specific prompts.
+
+Token counts use tiktoken's o200k_base encoding. Where it cannot be loaded
+(tiktoken fetches the encoding on first use, so offline runs fail) the counts
+are chars/4 estimates and are marked with "~". OpenAI only caches prompt
+prefixes of 1024 tokens or more; the "cacheable" column shows which prompts
+reach that, so a low "cached" count in live runs is expected.
+
+Usage (from the backend folder):
+    python -m benchmarks.roadmap_prompt            # prompt sizes only, no network
+    python -m benchmarks.roadmap_prompt --live 5   # also time 5 real requests per variant
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import HumanMessage, SystemMessage
+
+from agent import ROADMAP_PERSONA_PROMPTS, build_roadmap_system_prompt, chat_model
+
+LEGACY_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "data", "legacy_roadmap_prompt.txt")
+PROMPT_CACHE_MIN_TOKENS = 1024
+SAMPLE_TOPICS = {
+    "fresher": "I just graduated, give me a roadmap to become a data analyst",
+    "riser": "I have 5 years of experience, roadmap to move into engineering leadership",
+    "rejoiner": "Roadmap to return to work in finance after a career break",
+}
+
+def count_tokens(text):
+    """Return (tokens, exact): tiktoken's count, or an estimate at 4 chars per token if it cannot load."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text)), True
+    except Exception:
+        return len(text) // 4, False
+
+def time_request(system_prompt, topic):
+    """Stream one completion and return (time to first token, total time, cached prompt tokens)."""
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"Create a learning roadmap for: {topic}"),
+    ]
+    start = time.perf_counter()
+    first_token = None
+    cached_tokens = 0
+    for chunk in chat_model.stream(messages, stream_usage=True):
+        if first_token is None and chunk.content:
+            first_token = time.perf_counter() - start
+        usage = getattr(chunk, "usage_metadata", None) or {}
+        cached_tokens = usage.get("input_token_details", {}).get("cache_read", cached_tokens)
+    return first_token or 0.0, time.perf_counter() - start, cached_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", type=int, default=0, help="number of live requests per variant")
+    args = parser.parse_args()
+
+    with open(LEGACY_PROMPT_PATH, encoding="utf-8") as f:
+        legacy_prompt = f.read()
+
+    variants = {"legacy": (legacy_prompt, SAMPLE_TOPICS["fresher"])}
+    for persona in ROADMAP_PERSONA_PROMPTS:
+        variants[persona] = (build_roadmap_system_prompt(persona), SAMPLE_TOPICS[persona])
+
+    legacy_tokens, _ = count_tokens(legacy_prompt)
+    print(f"{'variant':<10} {'chars':>7} {'tokens':>7} {'saved':>7} {'cacheable':>10}")
+    for name, (prompt, _) in variants.items():
+        tokens, exact = count_tokens(prompt)
+        saved = 100 * (legacy_tokens - tokens) / legacy_tokens
+        shown = f"{'' if exact else '~'}{tokens}"
+        cacheable = "yes" if tokens >= PROMPT_CACHE_MIN_TOKENS else "no"
+        print(f"{name:<10} {len(prompt):>7} {shown:>7} {saved:>6.1f}% {cacheable:>10}")
+    if not exact:
+        print("~ estimated at 4 chars per token (tiktoken encoding unavailable)")
+
+    if not args.live:
+        return
+
+    print(f"\n{'variant':<10} {'ttft p50':>9} {'total p50':>10} {'cached':>7}")
+    for name, (prompt, topic) in variants.items():
+        results = [time_request(prompt, topic) for _ in range(args.live)]
+        ttft = statistics.median(r[0] for r in results)
+        total = statistics.median(r[1] for r in results)
+        cached = max(r[2] for r in results)
+        print(f"{name:<10} {ttft:>8.2f}s {total:>9.2f}s {cached:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0), from an Accept-Encoding header."""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header or "")
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress_response(response):
+    """
+    after_request hook: compress JSON/text bodies of at least COMPRESS_MIN_BYTES with
+    brotli (when installed) or gzip, as negotiated on Accept-Encoding.
+
+    The bytes sent then depend on the encoding, so these responses (304s included)
+    say Vary: Accept-Encoding and their ETags are made weak: the tag still
+    identifies the content, and If-None-Match compares weakly, but it no longer
+    claims byte-for-byte identity across encodings.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    if response.status_code in (204, 304):
+        return response
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
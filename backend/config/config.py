@@ -0,0 +1,15 @@
+# config/config.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class Config:
+    HERKEY_API_BASE_URL = os.getenv("HERKEY_API_BASE_URL", "https://api-prod.herkey.com/api/v1/herkey")
+
+    # Local job-listing mirror (see job_mirror.py)
+    JOB_MIRROR_ENABLED = os.getenv("JOB_MIRROR_ENABLED", "false").lower() == "true"
+    JOB_MIRROR_INTERVAL = int(os.getenv("JOB_MIRROR_INTERVAL", "600"))
+    JOB_MIRROR_PAGE_SIZE = int(os.getenv("JOB_MIRROR_PAGE_SIZE", "100"))
+    JOB_MIRROR_MAX_PAGES = int(os.getenv("JOB_MIRROR_MAX_PAGES", "50"))
+    JOB_MIRROR_MAX_AGE = int(os.getenv("JOB_MIRROR_MAX_AGE", "3600"))
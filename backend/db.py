@@ -1,10 +1,19 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, timeout as mongo_timeout
 from bson.objectid import ObjectId
 import os
 from datetime import datetime
-import bcrypt
 import secrets
+import base64
+import hashlib
 from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+
+from write_behind import WriteBehindBuffer
+from profile_cache import make_profile_cache
+from passwords import password_hasher
+from cache import TTLCache
+from tracing import tracer
+from deadline import MONGO_TIMEOUT, mark_degraded, time_left
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +28,34 @@ db = client["herkey_db"]
 users = db["users"]
 conversations = db["conversations"]
 
+# Conversation pages are read newest first by (timestamp, _id) per user
+try:
+    conversations.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+except PyMongoError as e:
+    print(f"Could not create conversations index: {e}")
+
+# Latest conversation id per user, for ETags. Saves in this process update it;
+# saves in other workers show up once the entry expires.
+conversation_versions = TTLCache(
+    maxsize=int(os.getenv("CONVERSATION_VERSION_CACHE_SIZE", "10000")),
+    ttl=int(os.getenv("CONVERSATION_VERSION_TTL", "30")),
+)
+
+# Cached account documents (without the password hash), keyed by uid
+account_cache = make_profile_cache(users, projection={"password": 0})
+
+# Conversation persistence: "sync" inserts inline on the request thread,
+# "buffered" hands inserts to a write-behind buffer that batches them
+CONVERSATION_WRITE_MODE = os.getenv("CONVERSATION_WRITE_MODE", "buffered")
+conversation_buffer = None
+if CONVERSATION_WRITE_MODE == "buffered":
+    conversation_buffer = WriteBehindBuffer(
+        conversations,
+        max_batch=int(os.getenv("CONVERSATION_BATCH_SIZE", "50")),
+        flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "1.0")),
+        max_pending=int(os.getenv("CONVERSATION_MAX_PENDING", "1000")),
+    )
+
 # User management functions
 def create_user(username, email, password):
     """
@@ -29,9 +66,8 @@ def create_user(username, email, password):
     if users.find_one({"email": email}):
         return None
     
-    # Hash the password
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+    # Hash the password (in the password process pool, off the request thread)
+    hashed_password = password_hasher.hash(password)
     
     # Generate API key for the user
     api_key = secrets.token_hex(16)
@@ -42,7 +78,7 @@ def create_user(username, email, password):
         "email": email,
         "password": hashed_password,
         "api_key": api_key,
-        "created_at": datetime.now(),
+        "created_at": datetime.utcnow(),
         "last_login": None
     }
     
@@ -50,6 +86,7 @@ def create_user(username, email, password):
     result = users.insert_one(user)
     # Add uid field to the user document for compatibility with profile setup
     users.update_one({'_id': result.inserted_id}, {'$set': {'uid': str(result.inserted_id)}})
+    account_cache.invalidate(str(result.inserted_id))
     return str(result.inserted_id)
 
 def authenticate_user(email, password):
@@ -58,12 +95,19 @@ def authenticate_user(email, password):
     Returns user_id if successful, None if failed
     """
     user = users.find_one({"email": email})
-    if user and bcrypt.checkpw(password.encode('utf-8'), user["password"]):
-        # Update last login timestamp
+    if not user:
+        return None
+    ok, new_hash = password_hasher.verify(password, user["password"])
+    if ok:
+        # Update last login timestamp, upgrading the hash if the cost factor changed
+        update = {"last_login": datetime.utcnow()}
+        if new_hash:
+            update["password"] = new_hash
         users.update_one(
             {"_id": user["_id"]},
-            {"$set": {"last_login": datetime.now()}}
+            {"$set": update}
         )
+        account_cache.invalidate(str(user["_id"]))
         return str(user["_id"])
     return None
 
@@ -73,7 +117,7 @@ def get_user_by_id(user_id):
     Returns user document if found, None otherwise
     """
     try:
-        user = users.find_one({"_id": ObjectId(user_id)})
+        user = account_cache.get(user_id, {"_id": ObjectId(user_id)})
         if user:
             # Don't return the password hash
             user.pop("password", None)
@@ -88,28 +132,102 @@ def save_conversation(user_id, message, response):
     Save conversation to database
     Returns conversation ID
     """
+    now = datetime.utcnow()
     conversation = {
+        "_id": ObjectId(),  # Assigned here so buffered writes can return it straight away
         "user_id": user_id,  # Store as string instead of ObjectId
         "message": message,
         "response": response,
-        "timestamp": datetime.now()
+        # Mongo keeps milliseconds; match it so buffered and stored copies page identically
+        "timestamp": now.replace(microsecond=now.microsecond // 1000 * 1000)
     }
-    result = conversations.insert_one(conversation)
-    return str(result.inserted_id)
+    with tracer.span("save_conversation", buffered=bool(conversation_buffer)):
+        if conversation_buffer:
+            conversation_buffer.add(conversation)
+        else:
+            conversations.insert_one(conversation)
+    conversation_versions.set(user_id, str(conversation["_id"]))
+    return str(conversation["_id"])
+
+def encode_conversation_cursor(convo):
+    """An opaque cursor pointing just past this conversation (newest-first order)."""
+    raw = f"{convo['timestamp'].isoformat()}|{convo['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_conversation_cursor(cursor):
+    """Returns (timestamp, ObjectId); raises ValueError for a malformed cursor."""
+    try:
+        timestamp, convo_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(convo_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _before(doc, position):
+    return position is None or (doc["timestamp"], doc["_id"]) < position
+
+def get_conversation_page(user_id, limit=10, cursor=None):
+    """
+    One page of a user's conversations, newest first, starting after `cursor`.
+    Uses keyset pagination on (timestamp, _id), so every page is an index range
+    scan however far back it is. Returns (conversations, next_cursor or None).
+    """
+    position = decode_conversation_cursor(cursor) if cursor else None
+    query = {"user_id": user_id}
+    if position:
+        timestamp, convo_id = position
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": convo_id}},
+        ]
+    # Read-your-writes: snapshot this user's conversations still waiting in the
+    # buffer *before* querying, so a batch flushed in between is in one or both
+    pending = []
+    if conversation_buffer:
+        pending = conversation_buffer.pending(lambda doc: doc["user_id"] == user_id and _before(doc, position))
+
+    # One extra document tells us whether there is another page
+    stored = list(conversations.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1))
+
+    if pending:
+        stored_ids = {convo["_id"] for convo in stored}
+        pending = [doc for doc in pending if doc["_id"] not in stored_ids]
+        if pending:
+            stored = sorted(stored + [dict(doc) for doc in pending], key=lambda doc: (doc["timestamp"], doc["_id"]), reverse=True)
+
+    page = stored[:limit]
+    next_cursor = encode_conversation_cursor(page[-1]) if len(stored) > limit else None
+    if not position:
+        conversation_versions.set(user_id, str(page[0]["_id"]) if page else "empty")
+    return page, next_cursor
+
+def get_conversation_version(user_id, cached_only=False):
+    """
+    The id of the user's latest conversation ("empty" if none), used for ETags.
+    With cached_only, returns None instead of querying Mongo on a cache miss.
+    """
+    version = conversation_versions.get(user_id)
+    if version is None and not cached_only:
+        page, _ = get_conversation_page(user_id, limit=1)
+        version = str(page[0]["_id"]) if page else "empty"
+    return version
+
+def conversation_etag(user_id, version, cursor=None, limit=10):
+    raw = f"{user_id}|{version}|{cursor or ''}|{limit}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
 
 def get_user_conversations(user_id, limit=10):
     """
     Get user conversations
     Returns list of conversations
     """
-    convo_list = []
     try:
-        cursor = conversations.find({"user_id": user_id}).sort("timestamp", -1).limit(limit)
-        for convo in cursor:
-            convo["_id"] = str(convo["_id"])
-            # No need to convert user_id as it's already a string
-            convo_list.append(convo)
-        return convo_list
+        # ObjectIds and datetimes are encoded by the app's JSON provider
+        # Bounded by the request's deadline; a turn without history still gets an answer
+        with tracer.span("get_user_conversations", limit=limit) as span, mongo_timeout(time_left(MONGO_TIMEOUT)):
+            conversation_list, _ = get_conversation_page(user_id, limit)
+            span.set(results=len(conversation_list))
+        return conversation_list
     except Exception as e:
         print(f"Error retrieving conversations: {e}")
+        mark_degraded("history")
         return []
\ No newline at end of file
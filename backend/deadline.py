@@ -0,0 +1,93 @@
+import concurrent.futures
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE_SECONDS", "8"))
+# Per-call caps; within a request each call gets the smaller of its cap and the time left
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+MONGO_TIMEOUT = float(os.getenv("MONGO_TIMEOUT_SECONDS", "3"))
+# Streams send a long answer piece by piece, so they get a longer budget
+STREAM_DEADLINE = float(os.getenv("STREAM_DEADLINE_SECONDS", "60"))
+# Socket timeouts can fire a little before the clock says the budget is gone
+EXPIRY_SLACK = 0.05
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting work the request no longer has time for."""
+
+class Deadline:
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        # Stages that fell back to a cheaper answer; shared with pool threads through the context
+        self.degraded = []
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+_current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+@contextmanager
+def deadline(seconds=CHAT_DEADLINE):
+    """
+    Give everything called inside (and work submitted with tracer.submit, which
+    copies the context) an overall time budget. Outbound calls take their
+    timeout from time_left(), so the request finishes close to the budget
+    instead of waiting on a stalled upstream.
+    """
+    current = Deadline(seconds)
+    token = _current_deadline.set(current)
+    try:
+        yield current
+    finally:
+        _current_deadline.reset(token)
+
+def remaining():
+    """Seconds left in the current budget (never negative), or None outside one."""
+    current = _current_deadline.get()
+    return None if current is None else max(0.0, current.remaining())
+
+def time_left(cap=None):
+    """
+    The timeout for the next stage: the smaller of `cap` and the time left.
+    Raises DeadlineExceeded when the budget is already spent.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if cap is None else min(cap, left)
+
+def expired():
+    """
+    True once the current budget is spent (never outside one). A call that
+    failed after that most likely hit the timeout time_left() shortened, which
+    says nothing about the upstream's health.
+    """
+    left = remaining()
+    return left is not None and left <= EXPIRY_SLACK
+
+def is_degraded():
+    """True if a stage of the current request has already fallen back (never outside a budget)."""
+    current = _current_deadline.get()
+    return current is not None and bool(current.degraded)
+
+def wait_for(future):
+    """A future's result, waiting no longer than the current budget allows."""
+    try:
+        return future.result(timeout=remaining())
+    except concurrent.futures.TimeoutError as e:
+        raise DeadlineExceeded("Request deadline exceeded") from e
+
+def mark_degraded(stage):
+    """Record that a stage answered with a fallback, so the response can say so."""
+    current = _current_deadline.get()
+    if current is not None and stage not in current.degraded:
+        current.degraded.append(stage)
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from deadline import time_left
+from llm_router import llm_router
+
+INTERVIEW_PLAN_SIZE = int(os.getenv("INTERVIEW_PLAN_SIZE", "6"))
+# How long a turn waits for the follow-up decision before serving the next planned question
+FOLLOW_UP_WAIT = float(os.getenv("INTERVIEW_FOLLOW_UP_WAIT", "1.5"))
+# How long the final feedback waits for answers still being scored
+SCORE_WAIT = float(os.getenv("INTERVIEW_SCORE_WAIT", "10"))
+# How long the first question waits for the plan before the default plan is used
+PLAN_WAIT = float(os.getenv("INTERVIEW_PLAN_WAIT", "20"))
+
+QUESTION_PLAN_PROMPT = """
+You are planning a realistic mock interview for a candidate.
+Role: {role}
+Experience: {experience} years
+Key skills: {skills}
+
+Write {count} interview questions in the order an interviewer would ask them: start with an
+introduction, cover the key skills, include at least one behavioural question, and end with a
+question about the candidate's goals.
+
+Return ONLY a JSON array, each item formatted as:
+{{"topic": "short topic label", "question": "the question to ask"}}
+"""
+
+FOLLOW_UP_PROMPT = """
+You are a mock interviewer for the role of {role}. Decide whether the candidate's answer needs a
+follow-up question (it is vague, incomplete, or mentions something worth probing).
+If it does, reply with only the follow-up question. If it does not, reply with only: NONE
+"""
+
+ADAPT_PROMPT = """
+You are a mock interviewer for the role of {role}. Rewrite the next planned question so it builds
+naturally on the candidate's recent answers, keeping the same topic and length. Reply with only the
+rewritten question.
+"""
+
+SCORE_PROMPT = """
+You are assessing one answer in a mock interview for the role of {role}.
+Score the answer from 1 (poor) to 5 (excellent) on relevance, depth, structure and clarity, taken together.
+Return ONLY a JSON object formatted as:
+{{"score": 1-5, "strength": "one short sentence", "improvement": "one short sentence"}}
+"""
+
+_interview_executor = ThreadPoolExecutor(max_workers=int(os.getenv("INTERVIEW_WORKERS", "4")), thread_name_prefix="interview")
+
+def default_plan(role, skills):
+    """Generic questions used when the planning call fails."""
+    questions = [
+        ("introduction", f"Tell me about yourself and why you are interested in this {role} role."),
+        ("skills", f"Which of your skills ({skills}) are you strongest in? Walk me through a project where you used it."),
+        ("problem solving", "Describe a difficult problem you solved at work. How did you approach it?"),
+        ("behavioural", "Tell me about a time you disagreed with a teammate. How did you handle it?"),
+        ("growth", "What is something you learned recently, and how did you apply it?"),
+        ("goals", "Where do you see yourself in three years, and how does this role fit in?"),
+    ]
+    return [{"topic": topic, "question": question} for topic, question in questions[:INTERVIEW_PLAN_SIZE]]
+
+def parse_plan(content):
+    """Parse the planner's JSON array, returning None if it is unusable."""
+    content = content.strip()
+    if content.startswith("```"):
+        match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", content)
+        content = match.group(1) if match else content
+    try:
+        items = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(items, list):
+        return None
+    plan = [
+        {"topic": str(item.get("topic", "")), "question": item["question"].strip()}
+        for item in items
+        if isinstance(item, dict) and isinstance(item.get("question"), str) and item["question"].strip()
+    ]
+    return plan[:INTERVIEW_PLAN_SIZE] or None
+
+def build_question_plan(role, experience, skills):
+    """One LLM call that plans the whole interview from the candidate's profile."""
+    messages = [HumanMessage(content=QUESTION_PLAN_PROMPT.format(
+        role=role, experience=experience, skills=skills, count=INTERVIEW_PLAN_SIZE
+    ))]
+    try:
+        plan = parse_plan(llm_router.invoke("interview_plan", messages).content)
+    except Exception as e:
+        print(f"Interview planning failed, using default plan: {str(e)}")
+        plan = None
+    return plan or default_plan(role, skills)
+
+def decide_follow_up(role, question, answer):
+    """A small, fast call on just the last question and answer; returns a follow-up question or None."""
+    messages = [
+        SystemMessage(content=FOLLOW_UP_PROMPT.format(role=role)),
+        HumanMessage(content=f"Question: {question}\nAnswer: {answer}"),
+    ]
+    try:
+        reply = llm_router.invoke("interview_followup", messages).content.strip()
+    except Exception as e:
+        print(f"Follow-up decision failed, moving on: {str(e)}")
+        return None
+    if not reply or reply.strip(" .").upper() == "NONE":
+        return None
+    return reply
+
+def adapt_question(role, question, answers):
+    """Reword the next planned question in light of the answers so far; returns None to keep it as is."""
+    recent = "\n".join(f"- {answer}" for answer in answers[-3:])
+    messages = [
+        SystemMessage(content=ADAPT_PROMPT.format(role=role)),
+        HumanMessage(content=f"Candidate's recent answers:\n{recent}\n\nNext planned question: {question}"),
+    ]
+    try:
+        reply = llm_router.invoke("interview_followup", messages).content.strip()
+    except Exception as e:
+        print(f"Question adaptation failed, using the planned question: {str(e)}")
+        return None
+    return reply or None
+
+def parse_score(content):
+    """Parse the scorer's JSON object, returning None if it is unusable."""
+    match = re.search(r"\{[\s\S]*\}", content)
+    if not match:
+        return None
+    try:
+        result = json.loads(match.group(0))
+        score = min(5, max(1, int(result["score"])))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+    return {
+        "score": score,
+        "strength": str(result.get("strength", "")).strip(),
+        "improvement": str(result.get("improvement", "")).strip(),
+    }
+
+def score_answer(role, question, answer):
+    """Score one answer against the rubric; returns a score dict or None if scoring failed."""
+    messages = [
+        SystemMessage(content=SCORE_PROMPT.format(role=role)),
+        HumanMessage(content=f"Question: {question['question']}\nAnswer: {answer}"),
+    ]
+    try:
+        result = parse_score(llm_router.invoke("interview_score", messages).content)
+    except Exception as e:
+        print(f"Answer scoring failed: {str(e)}")
+        return None
+    if result is not None:
+        result["topic"] = question.get("topic", "")
+    return result
+
+def summarize_scores(scores):
+    """Build the final feedback from the stored per-answer scores (no LLM call)."""
+    if not scores:
+        return "Thanks for completing the mock interview! I couldn't score your answers this time, so please try another round."
+
+    average = sum(s["score"] for s in scores) / len(scores)
+    ranked = sorted(scores, key=lambda s: s["score"], reverse=True)
+    # dict.fromkeys drops repeated notes while keeping the ranking order
+    strengths = list(dict.fromkeys(s["strength"] for s in ranked if s["strength"] and s["score"] >= 3))[:3]
+    improvements = list(dict.fromkeys(s["improvement"] for s in reversed(ranked) if s["improvement"]))[:3]
+
+    lines = [f"Overall rating: {average:.1f}/5 across {len(scores)} answers.", ""]
+    if strengths:
+        lines += ["What went well:"] + [f"- {text}" for text in strengths] + [""]
+    if improvements:
+        lines += ["What to work on:"] + [f"- {text}" for text in improvements] + [""]
+    lines += ["Score by question:"] + [f"- {s['topic'] or 'question'}: {s['score']}/5" for s in scores]
+    return "\n".join(lines)
+
+class InterviewPlan:
+    """
+    The question plan for one mock interview session, built in the background as
+    soon as the profile is known. A turn never waits on the full conversation:
+    after each answer a small follow-up decision gets up to `follow_up_wait`
+    seconds, otherwise the next planned question is served at once. While the
+    user answers, the question after it is adapted to their answers in the
+    background and used if it is ready in time. Every answer is also scored in
+    the background, so the final feedback only aggregates stored scores.
+    """
+    def __init__(self, role, experience, skills, follow_up_wait=None):
+        self.role = role
+        self.skills = skills
+        self.follow_up_wait = FOLLOW_UP_WAIT if follow_up_wait is None else follow_up_wait
+        self.answers = []
+        self.position = 0
+        self.current = None
+        self._plan_future = _interview_executor.submit(build_question_plan, role, experience, skills)
+        self._questions = None
+        self._follow_up_future = None
+        self._adapted_future = None
+        self._score_futures = []
+
+    @property
+    def questions(self):
+        """The question plan, waiting up to PLAN_WAIT (or the request's time left) for it.
+        A plan that is not ready by then is replaced by the default one for the whole session."""
+        if self._questions is None:
+            try:
+                self._questions = self._plan_future.result(timeout=time_left(PLAN_WAIT))
+            except Exception as e:
+                print(f"Interview plan not ready, using default plan: {str(e) or type(e).__name__}")
+                self._questions = default_plan(self.role, self.skills)
+        return self._questions
+
+    @staticmethod
+    def _ready_result(future, timeout=0):
+        """A future's result if it finishes within timeout, else None (the turn does not wait longer)."""
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def next_question(self):
+        """The next question to ask, or None when the interview is complete."""
+        follow_up = self._ready_result(self._follow_up_future, self.follow_up_wait)
+        self._follow_up_future = None
+        if follow_up:
+            # The planned question (and its adaptation, if any) stays next
+            self.current = {"topic": "follow-up", "question": follow_up, "follow_up": True}
+            return self.current
+        if self.position >= len(self.questions):
+            self.current = None
+            return None
+
+        adapted = self._ready_result(self._adapted_future)
+        self._adapted_future = None
+        self.current = dict(self.questions[self.position])
+        if adapted:
+            self.current["question"] = adapted
+        self.position += 1
+        if self.position < len(self.questions) and self.answers:
+            self._adapted_future = _interview_executor.submit(
+                adapt_question, self.role, self.questions[self.position]["question"], list(self.answers)
+            )
+        return self.current
+
+    def record_answer(self, answer):
+        """Store the answer, start scoring it and start the follow-up decision (follow-ups themselves get none)."""
+        self.answers.append(answer)
+        if self.current:
+            self._score_futures.append(_interview_executor.submit(score_answer, self.role, self.current, answer))
+        if self.current and not self.current.get("follow_up"):
+            self._follow_up_future = _interview_executor.submit(decide_follow_up, self.role, self.current["question"], answer)
+
+    def scores(self, timeout=SCORE_WAIT):
+        """The scores stored so far, in answer order, waiting up to `timeout` seconds in total for pending ones."""
+        deadline = time.monotonic() + timeout
+        results = (self._ready_result(f, max(0.0, deadline - time.monotonic())) for f in self._score_futures)
+        return [result for result in results if result is not None]
+
+    def feedback(self):
+        return summarize_scores(self.scores())
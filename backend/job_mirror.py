@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+from config.config import Config
+from tools.api_client import HerkeyAPIClient
+
+# Fields that are indexed, mapped to the HerKey job keys they come from
+INDEXED_FIELDS = {
+    "title": "title",
+    "skills": "skills",
+    "location": "location_name",
+    "work_mode": "work_mode",
+    "job_type": "job_types",
+}
+
+# Words the LLM tends to put in `keyword` that never appear in a listing
+KEYWORD_STOPWORDS = {
+    "a", "an", "and", "as", "at", "for", "in", "of", "on", "or", "the", "to", "with",
+    "job", "jobs", "role", "roles", "opening", "openings", "position", "positions", "opportunity", "opportunities",
+}
+
+def tokenize(value):
+    """Lowercase word tokens for a string or a list of strings."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(v) for v in value)
+    return re.findall(r"[a-z0-9][a-z0-9+#.]*", str(value).lower())
+
+def is_expired(job, now=None):
+    """True if the job has an expires_on date in the past (unparseable dates count as active)."""
+    expires_on = job.get("expires_on")
+    if not expires_on:
+        return False
+    try:
+        return datetime.strptime(expires_on, "%Y-%m-%d %H:%M:%S") <= (now or datetime.now())
+    except (ValueError, TypeError):
+        return False
+
+class JobMirror:
+    """
+    A local copy of active HerKey listings with an inverted index over title,
+    skills, location, work_mode and job_type. A background thread re-harvests
+    every `interval` seconds; searches are answered from memory and return None
+    on a miss so the caller can fall back to HerKey. When the harvest stopped at
+    `max_pages` the mirror holds only part of the listings, so a page it cannot
+    fill is a miss as well: HerKey may have the rest.
+    """
+    def __init__(self, client=None, interval=None, page_size=None, max_pages=None, max_age=None):
+        self.client = client or HerkeyAPIClient()
+        self.interval = interval or Config.JOB_MIRROR_INTERVAL
+        self.page_size = page_size or Config.JOB_MIRROR_PAGE_SIZE
+        self.max_pages = max_pages or Config.JOB_MIRROR_MAX_PAGES
+        self.max_age = max_age or Config.JOB_MIRROR_MAX_AGE
+        self.jobs = {}
+        self.order = []
+        self.index = {field: {} for field in INDEXED_FIELDS}
+        self.last_synced = None
+        # Whether the last harvest reached the end of the listings
+        self.complete = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def harvest(self):
+        """Page through es_candidate_jobs, drop expired postings and swap in a fresh index."""
+        token = self.client.generate_session()
+        now = datetime.now()
+        jobs = {}
+        order = []
+        complete = False
+
+        for page_no in range(1, self.max_pages + 1):
+            data = self.client.es_candidate_jobs(
+                {"page_no": page_no, "page_size": self.page_size, "is_global_query": "false"}, token
+            )
+            body = data.get("body") or []
+            for job in body:
+                job_id = job.get("id")
+                if job_id is None or job_id in jobs or is_expired(job, now):
+                    continue
+                jobs[job_id] = job
+                order.append(job_id)
+            if not body or not (data.get("pagination") or {}).get("has_next", len(body) >= self.page_size):
+                complete = True
+                break
+
+        index = {field: {} for field in INDEXED_FIELDS}
+        for job_id in order:
+            for field, job_key in INDEXED_FIELDS.items():
+                for token_ in tokenize(jobs[job_id].get(job_key)):
+                    index[field].setdefault(token_, set()).add(job_id)
+
+        with self._lock:
+            self.jobs, self.order, self.index = jobs, order, index
+            self.complete = complete
+            self.last_synced = time.time()
+        print(f"Job mirror synced {len(jobs)} active listings{'' if complete else ' (partial)'}")
+        return len(jobs)
+
+    def is_ready(self):
+        return self.last_synced is not None and time.time() - self.last_synced < self.max_age
+
+    def _match(self, index, field, tokens, require_all=True):
+        """Job ids matching the tokens in one field (all tokens, or any when require_all is False)."""
+        sets = [index[field].get(t, set()) for t in tokens]
+        if not sets:
+            return None
+        return set.intersection(*sets) if require_all else set.union(*sets)
+
+    def search(self, params):
+        """
+        Answer a HerKey-style search from the mirror.
+        Returns a response shaped like es_candidate_jobs, or None on a miss.
+        """
+        if not self.is_ready():
+            return None
+
+        with self._lock:
+            jobs, order, index, complete = self.jobs, self.order, self.index, self.complete
+
+        candidates = None
+        keyword_tokens = [t for t in tokenize(params.get("keyword")) if t not in KEYWORD_STOPWORDS]
+        for token_ in keyword_tokens:
+            # A keyword word may appear in either the title or the skills
+            matches = index["title"].get(token_, set()) | index["skills"].get(token_, set())
+            candidates = matches if candidates is None else candidates & matches
+
+        filters = [
+            self._match(index, "skills", tokenize(params.get("job_skills")), require_all=False),
+            self._match(index, "location", tokenize(params.get("location_name"))),
+            self._match(index, "work_mode", tokenize(params.get("work_mode"))),
+            self._match(index, "job_type", tokenize(params.get("job_types"))),
+        ]
+        for matches in filters:
+            if matches is not None:
+                candidates = matches if candidates is None else candidates & matches
+
+        if not candidates:
+            return None
+
+        now = datetime.now()
+        results = [jobs[job_id] for job_id in order if job_id in candidates and not is_expired(jobs[job_id], now)]
+        if not results:
+            return None
+
+        page_no = int(params.get("page_no", 1))
+        page_size = int(params.get("page_size", 15))
+        start = (page_no - 1) * page_size
+        if not complete and len(results) < start + page_size:
+            return None
+        return {
+            "body": results[start:start + page_size],
+            "pagination": {
+                "page_no": page_no,
+                "page_size": page_size,
+                "total_items": len(results),
+                "has_next": start + page_size < len(results),
+            },
+            "source": "mirror",
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.harvest()
+            except Exception as e:
+                print(f"Job mirror harvest failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background harvester (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+job_mirror = JobMirror()
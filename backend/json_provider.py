@@ -0,0 +1,68 @@
+import dataclasses
+import decimal
+from datetime import date, datetime, timezone
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(o):
+    """Types the encoders do not handle natively: Mongo ids, dates, sets and the like."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        # Naive datetimes are UTC here (datetime.utcnow()), as with orjson's OPT_NAIVE_UTC
+        return (o if o.tzinfo else o.replace(tzinfo=timezone.utc)).isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed (falling
+    back to the standard library otherwise). ObjectIds become strings and
+    datetimes ISO 8601 on both paths, so routes can return Mongo documents as is.
+    The app stores naive UTC datetimes (datetime.utcnow()), so naive values are
+    sent with an explicit "+00:00" offset (orjson's OPT_NAIVE_UTC); without it
+    browsers would parse them as local time. Keys are not sorted and non-ASCII
+    text is sent as UTF-8.
+    """
+    default = staticmethod(_default)
+    sort_keys = False
+    ensure_ascii = False
+
+    def _orjson_dumps(self, obj, indent=None):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {"indent"}:
+            try:
+                return self._orjson_dumps(obj, kwargs.get("indent")).decode("utf-8")
+            except TypeError:
+                # e.g. integers beyond 64 bits; the standard library copes
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is None and self._app.debug or self.compact is False
+        try:
+            body = self._orjson_dumps(obj, indent) + b"\n"
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,107 @@
+import json
+import re
+
+class ArrayItemParser:
+    """
+    Splits a JSON array of objects into the text of each top-level object as
+    the array streams in, so each item can be handled as soon as it closes.
+    Anything before the opening '[' (prose, a ```json fence) is skipped; the
+    array starts at a '[' followed (after optional whitespace) by '{', so a
+    bracket in the prose ("see [1]") is not taken for it.
+    Items are returned as raw text; decoding (and repairing) is up to the caller.
+    """
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        # Saw a '[' that may open the array, if a '{' follows
+        self._bracket = False
+        self.done = False
+
+    def feed(self, text):
+        """Consume the next chunk; returns the raw text of every item it completed."""
+        items = []
+        for ch in text:
+            if self.done:
+                break
+            if not self._started:
+                if not (self._bracket and ch == "{"):
+                    if not (self._bracket and ch.isspace()):
+                        self._bracket = ch == "["
+                    continue
+                # This brace opens the first item
+                self._started = True
+            if self._depth == 0:
+                # Between items only an opening brace or the closing bracket matter
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self.done = True
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append("".join(self._buffer))
+                    self._buffer = []
+        return items
+
+    def remainder(self):
+        """The text of an item left unfinished when the stream ended ("" if none)."""
+        return "".join(self._buffer) if self._depth else ""
+
+def repair_json_object(raw):
+    """
+    Decode one JSON object, fixing the mistakes models commonly make: curly
+    quotes, trailing commas, raw newlines inside strings and a truncated end.
+    Returns the decoded value, or None if it cannot be repaired.
+    """
+    fixed = re.sub(r",\s*([}\]])", r"\1", raw.strip())
+    candidates = [fixed]
+
+    # Truncated: close an open string, then the open brackets
+    depth_stack = []
+    in_string = escape = False
+    for ch in fixed:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth_stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and depth_stack:
+            depth_stack.pop()
+    if in_string or depth_stack:
+        closed = fixed + ('"' if in_string else "")
+        closed = re.sub(r",\s*$", "", closed)
+        candidates.append(closed + "".join(reversed(depth_stack)))
+
+    # Curly quotes may be legitimate text, so only try them as delimiters last
+    candidates += [c.replace("“", '"').replace("”", '"') for c in candidates if "“" in c or "”" in c]
+    for candidate in candidates:
+        try:
+            # strict=False accepts control characters (raw newlines) inside strings
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+    return None
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from langchain_cohere import ChatCohere
+from langchain_openai import ChatOpenAI
+
+from resilience import CircuitBreaker, get_llm_breaker
+from tracing import tracer, token_usage
+from deadline import LLM_TIMEOUT, DeadlineExceeded, expired, time_left
+
+load_dotenv()
+
+# Known models: provider, quality tier (higher is better) and a latency prior
+# in seconds used until live measurements exist
+MODELS = {
+    "gpt-4.1-nano": {"provider": "openai", "tier": 1, "expected_latency": 1.0},
+    "gpt-4.1-mini": {"provider": "openai", "tier": 2, "expected_latency": 2.0},
+    "gpt-4.1": {"provider": "openai", "tier": 3, "expected_latency": 4.0},
+    "command-r": {"provider": "cohere", "tier": 2, "expected_latency": 2.5},
+    "command-r-plus": {"provider": "cohere", "tier": 3, "expected_latency": 4.0},
+}
+
+# Each task names the minimum quality tier it needs and the models allowed to serve it
+TASK_ROUTES = {
+    "classify": {"tier": 1, "models": ["gpt-4.1-nano", "gpt-4.1-mini", "command-r"]},
+    "extract_job_params": {"tier": 1, "models": ["gpt-4.1-nano", "gpt-4.1-mini", "command-r"]},
+    "text": {"tier": 1, "models": ["gpt-4.1-nano", "gpt-4.1-mini", "command-r"]},
+    "roadmap": {"tier": 1, "models": ["gpt-4.1-nano", "gpt-4.1-mini", "command-r"]},
+    "coach": {"tier": 3, "models": ["command-r-plus", "gpt-4.1"]},
+    "interview": {"tier": 3, "models": ["command-r-plus", "gpt-4.1"]},
+    "interview_plan": {"tier": 2, "models": ["gpt-4.1-mini", "command-r", "command-r-plus", "gpt-4.1"]},
+    "interview_followup": {"tier": 1, "models": ["gpt-4.1-nano", "gpt-4.1-mini", "command-r"]},
+    "interview_score": {"tier": 2, "models": ["gpt-4.1-mini", "command-r", "gpt-4.1"]},
+}
+# LLM_ROUTES='{"roadmap": {"tier": 2, "models": ["gpt-4.1-mini"]}}' overrides routes per task
+TASK_ROUTES.update(json.loads(os.getenv("LLM_ROUTES", "{}")))
+
+EWMA_ALPHA = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+# An unhealthy model gets another chance after this many seconds without failures
+RETRY_UNHEALTHY_AFTER = float(os.getenv("LLM_ROUTER_RETRY_SECONDS", "60"))
+
+class ModelStats:
+    """EWMA latency and error rate for one model serving one task."""
+    def __init__(self, expected_latency):
+        self.latency = expected_latency
+        self.error_rate = 0.0
+        self.calls = 0
+        self.last_failure = 0.0
+
+    def record(self, ok, latency):
+        self.calls += 1
+        if not ok:
+            self.last_failure = time.monotonic()
+        self.error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * self.error_rate
+        if ok and latency is not None:
+            self.latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+
+class NoModelAvailable(Exception):
+    """Raised when every model for a task failed or is unhealthy."""
+
+class LLMRouter:
+    """
+    Sends each LLM call to the fastest healthy model that meets the task's
+    quality tier, trying the next candidate if it fails. Every decision is
+    kept in a bounded log.
+    """
+    def __init__(self, models=MODELS, routes=TASK_ROUTES):
+        self.models = models
+        self.routes = routes
+        self._clients = {}
+        # Keyed by (task, model): a roadmap and a one-word classification have very different latencies
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.decisions = deque(maxlen=200)
+
+    def get_model(self, name):
+        """Return the (shared) LangChain chat model for a model name."""
+        with self._lock:
+            if name not in self._clients:
+                if self.models[name]["provider"] == "cohere":
+                    self._clients[name] = ChatCohere(cohere_api_key=os.getenv("COHERE_API_KEY"), model=name, temperature=0.3, timeout_seconds=LLM_TIMEOUT)
+                else:
+                    self._clients[name] = ChatOpenAI(model=name, temperature=0.3, timeout=LLM_TIMEOUT)
+            return self._clients[name]
+
+    def _get_stats(self, task, name):
+        key = (task, name)
+        if key not in self._stats:
+            self._stats[key] = ModelStats(self.models[name]["expected_latency"])
+        return self._stats[key]
+
+    def _healthy(self, task, name):
+        stats = self._get_stats(task, name)
+        recovered = stats.error_rate < MAX_ERROR_RATE or time.monotonic() - stats.last_failure > RETRY_UNHEALTHY_AFTER
+        return recovered and self._breaker(name).state != CircuitBreaker.OPEN
+
+    def _breaker(self, name):
+        return get_llm_breaker(self.models[name]["provider"], name)
+
+    def candidates(self, task):
+        """Eligible models for a task: healthy ones fastest first, then unhealthy ones as a last resort."""
+        route = self.routes[task]
+        eligible = [m for m in route["models"] if m in self.models and self.models[m]["tier"] >= route["tier"]]
+        with self._lock:
+            healthy = sorted((m for m in eligible if self._healthy(task, m)), key=lambda m: self._get_stats(task, m).latency)
+        return healthy + [m for m in eligible if m not in healthy]
+
+    def _call_options(self, name):
+        """
+        Per-call options bounding the call by the request's deadline. Raises
+        DeadlineExceeded when none is left. Cohere clients only take the timeout
+        they were built with, so for them the check before the call is the bound.
+        """
+        timeout = time_left(LLM_TIMEOUT)
+        return {"timeout": timeout} if self.models[name]["provider"] == "openai" else {}
+
+    def _record(self, task, name, attempt, ok, latency, measured=True):
+        with self._lock:
+            self._get_stats(task, name).record(ok, latency if measured else None)
+        self.decisions.append({
+            "task": task,
+            "model": name,
+            "attempt": attempt,
+            "ok": ok,
+            "latency": round(latency, 3),
+            "timestamp": time.time(),
+        })
+
+    def invoke(self, task, messages):
+        """Invoke the best model for the task, falling through the candidates on failure
+        (DeadlineExceeded is raised once the request has no time left for another)."""
+        error = None
+        with tracer.span("llm.invoke", task=task) as span:
+            for attempt, name in enumerate(self.candidates(task)):
+                options = self._call_options(name)
+                start = time.monotonic()
+                try:
+                    response = self._breaker(name).call(self.get_model(name).invoke, messages, **options)
+                    ok = True
+                except DeadlineExceeded:
+                    # Cut short by the request's deadline: neither the model's fault nor worth a retry
+                    raise
+                except Exception as e:
+                    error = e
+                    ok = False
+                self._record(task, name, attempt, ok, time.monotonic() - start)
+                if ok:
+                    span.set(model=name, attempts=attempt + 1, **token_usage(response))
+                    return response
+            raise NoModelAvailable(f"No model available for {task}: {error}")
+
+    def stream(self, task, messages):
+        """
+        Stream chunks from the best model for the task. A model that fails before
+        its first chunk is skipped for the next candidate; a failure mid-stream is
+        raised. A caller may stop reading early (its latency is then not recorded).
+        """
+        error = None
+        for attempt, name in enumerate(self.candidates(task)):
+            options = self._call_options(name)
+            breaker = self._breaker(name)
+            if not breaker.allow():
+                self._record(task, name, attempt, False, 0.0)
+                continue
+            start = time.monotonic()
+            started = False
+            completed = False
+            failed = False
+            try:
+                for chunk in self.get_model(name).stream(messages, **options):
+                    started = True
+                    yield chunk
+                completed = True
+            except Exception as e:
+                failed = True
+                if expired():
+                    # Cut short by the request's deadline: not recorded against the model
+                    breaker.release_probe()
+                    raise DeadlineExceeded("Request deadline exceeded") from e
+                error = e
+                latency = time.monotonic() - start
+                breaker.record(False, latency)
+                self._record(task, name, attempt, False, latency)
+                if started:
+                    raise
+                continue
+            finally:
+                if started and not completed and not failed:
+                    # The caller stopped reading: the model answered fine
+                    breaker.record(True, 0.0)
+                    self._record(task, name, attempt, True, time.monotonic() - start, measured=False)
+            latency = time.monotonic() - start
+            breaker.record(True, latency)
+            self._record(task, name, attempt, True, latency)
+            return
+        raise NoModelAvailable(f"No model available for {task}: {error}")
+
+    def snapshot(self):
+        return {
+            "models": {
+                f"{task}/{name}": {"latency_ewma": round(s.latency, 3), "error_rate_ewma": round(s.error_rate, 3), "calls": s.calls}
+                for (task, name), s in list(self._stats.items())
+            },
+            "recent_decisions": list(self.decisions)[-20:],
+        }
+
+llm_router = LLMRouter()
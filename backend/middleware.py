@@ -1,11 +1,21 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, session, Response
 import jwt
+import hmac
 import os
 from dotenv import load_dotenv
 
+from rate_limit import rate_limiter
+
 load_dotenv()
 
+# Shared with app.py, which signs the tokens these decorators check
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
+JWT_ALGORITHM = 'HS256'
+
+# How many reverse proxies in front of the app append to X-Forwarded-For (0: trust none)
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -18,11 +28,81 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
             
         try:
-            data = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+            data = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
             current_user = data['uid']
         except:
             return jsonify({'error': 'Token is invalid'}), 401
             
         return f(current_user, *args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+def _authenticated_user_id():
+    """The user id from a valid bearer token or the signed session cookie, else None.
+    Ids sent in the request body are not trusted here."""
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        try:
+            return jwt.decode(auth[7:], JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])['uid']
+        except Exception:
+            pass
+    return session.get('user_id')
+
+def _client_ip():
+    """The client address: the socket peer, or with TRUSTED_PROXY_COUNT set, the
+    X-Forwarded-For entry added by the outermost trusted proxy (the right-most
+    hops are ours; anything left of them is client-supplied)."""
+    if TRUSTED_PROXY_COUNT:
+        hops = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_COUNT:
+            return hops[-TRUSTED_PROXY_COUNT]
+    return request.remote_addr
+
+def _client_key():
+    """Rate-limit identity: the authenticated user, otherwise the client IP."""
+    user_id = _authenticated_user_id()
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{_client_ip()}"
+
+def admission_control(f):
+    """Per-user/IP token bucket plus a global concurrency limit for LLM-backed routes.
+    Sheds load with 429 and Retry-After. A streamed response holds its concurrency
+    slot until the stream is closed, not just until the view returns."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        allowed, retry_after = rate_limiter.check(_client_key())
+        if not allowed:
+            response = jsonify({'error': 'Too many requests, please slow down'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+
+        if not rate_limiter.concurrency.acquire():
+            response = jsonify({'error': 'Server is busy, please try again shortly'})
+            response.headers['Retry-After'] = str(max(1, int(rate_limiter.concurrency.deadline)))
+            return response, 429
+        streaming = False
+        try:
+            result = f(*args, **kwargs)
+            if isinstance(result, Response) and result.is_streamed:
+                result.call_on_close(rate_limiter.concurrency.release)
+                streaming = True
+            return result
+        finally:
+            if not streaming:
+                rate_limiter.concurrency.release()
+    
+    return decorated
+
+def admin_required(f):
+    """Requires the ADMIN_TOKEN in an X-Admin-Token header; admin routes are off when it is unset."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        admin_token = os.getenv('ADMIN_TOKEN')
+        if not admin_token:
+            return jsonify({'error': 'Not found'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({'error': 'Forbidden'}), 403
+        return f(*args, **kwargs)
+
+    return decorated
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password operations are already queued; callers answer 503."""
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def hash_rounds(hashed):
+    """The cost factor stored in a bcrypt hash ("$2b$12$..." -> 12)."""
+    return int(hashed.split(b"$")[2])
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small process pool so hashing and verification neither
+    hold a request thread's GIL nor compete with chat traffic for it. At most
+    `max_pending` operations may be queued or running; beyond that callers get
+    PasswordPoolBusy straight away instead of waiting behind a login storm, and
+    an operation not finished within `timeout` seconds raises it as well.
+    If a worker dies (OOM killer, segfault) the pool is replaced and the
+    operation retried once.
+    """
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=2, max_pending=32, timeout=10.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"hashes": 0, "checks": 0, "rehashes": 0, "rejected": 0, "restarts": 0, "timeouts": 0, "max_pending_seen": 0, "total_seconds": 0.0}
+
+    def start(self):
+        """
+        Fork the worker processes now. This module is imported before the app
+        starts any threads, and forking then is safe; spawned workers would
+        instead re-import the app's __main__ (Mongo clients, background jobs).
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+                # With fork, the first submit starts every worker
+                self._pool.submit(int).result()
+            return self._pool
+
+    def _restart(self, broken):
+        """
+        Replace a broken pool and return the new one (a concurrent caller may have
+        replaced it already). Unlike start() this forks with the app's threads
+        running; the workers only ever run bcrypt, so that is acceptable.
+        """
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+                self.stats["restarts"] += 1
+        broken.shutdown(wait=False)
+        return self.start()
+
+    def _run(self, fn, *args):
+        pool = self.start()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise PasswordPoolBusy("Too many password operations in progress")
+            self._pending += 1
+            self.stats["max_pending_seen"] = max(self.stats["max_pending_seen"], self._pending)
+        start = time.monotonic()
+        try:
+            try:
+                return pool.submit(fn, *args).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                print("Password worker died, restarting the pool")
+                return self._restart(pool).submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            # The workers are backed up; the caller answers 503 like any other overload
+            self._count("timeouts")
+            raise PasswordPoolBusy("Password operation timed out")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.stats["total_seconds"] += time.monotonic() - start
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def hash(self, password):
+        self._count("hashes")
+        return self._run(_hash, password.encode("utf-8"), self.rounds)
+
+    def verify(self, password, hashed):
+        """
+        Check a password against its stored hash. Returns (ok, new_hash); new_hash
+        is set when the password matched but was hashed with a different cost
+        factor, so the caller can store the rehashed value.
+        """
+        self._count("checks")
+        if not self._run(_check, password.encode("utf-8"), hashed):
+            return False, None
+        if hash_rounds(hashed) == self.rounds:
+            return True, None
+        self._count("rehashes")
+        return True, self.hash(password)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            pending = self._pending
+        operations = stats["hashes"] + stats["checks"]
+        return {
+            **stats,
+            "rounds": self.rounds,
+            "pending": pending,
+            "avg_seconds": round(stats["total_seconds"] / operations, 4) if operations else None,
+        }
+
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_MAX_PENDING", "32")),
+    timeout=float(os.getenv("PASSWORD_TIMEOUT", "10")),
+)
+password_hasher.start()
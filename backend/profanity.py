@@ -1,6 +1,7 @@
-import requests
 import random
 
+from resilience import breakers, hedged_get
+
 from dotenv import load_dotenv
 import os
 
@@ -18,7 +19,12 @@ PROFANITY_RESPONSES = [
 
 def check_profanity(text: str) -> bool:
     api_url = f'https://api.api-ninjas.com/v1/profanityfilter?text={text}'
-    response = requests.get(api_url, headers={'X-Api-Key': PROFANITY_API_KEY})
+    try:
+        response = hedged_get(breakers["profanity"], api_url, headers={'X-Api-Key': PROFANITY_API_KEY}, timeout=5)
+    except Exception as e:
+        # Skip the check rather than hold up the conversation when the API is down
+        print(f"Profanity check skipped: {str(e)}")
+        return False
     if response.status_code == 200:
         return response.json().get("has_profanity", False)
     else:
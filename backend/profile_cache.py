@@ -0,0 +1,118 @@
+import copy
+import os
+import threading
+import time
+
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+
+_MISSING = object()
+# Change stream reconnects back off up to this many seconds
+WATCH_MAX_BACKOFF = 60
+
+class ProfileCache:
+    """
+    A bounded LRU+TTL cache of user documents keyed by `uid`.
+
+    Writers in this process call invalidate() as they write. Other processes
+    learn about writes through a change stream on the collection (started with
+    watch()); where change streams are unavailable (no replica set) the TTL
+    bounds how stale another worker's copy can get. Lookups that find no user
+    are cached for `miss_ttl` only, so a user who signs up right after a failed
+    lookup is seen quickly.
+
+    An invalidation that lands while a miss is reading Mongo bumps that uid's
+    generation, and the read then is not cached: it may be from before the write.
+    """
+    def __init__(self, collection, maxsize=5000, ttl=300, miss_ttl=5, projection=None):
+        self.collection = collection
+        self.projection = projection
+        self.miss_ttl = miss_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Lets deletes (which carry only the _id) find the uid; entries expire with the cached user
+        self._uids_by_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Generation and reader count per uid, kept only while a read of it is in flight
+        self._generations = {}
+        self._readers = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "stale_reads": 0, "watch_errors": 0}
+
+    def get(self, uid, query=None):
+        """Return a copy of the user document for uid (or None), reading Mongo only on a miss."""
+        doc = self._cache.get(uid, _MISSING)
+        if doc is not _MISSING:
+            self.stats["hits"] += 1
+            # Callers often edit the result (e.g. str(_id)), so never hand out the cached object
+            return copy.deepcopy(doc)
+
+        self.stats["misses"] += 1
+        with self._lock:
+            generation = self._generations.get(uid, 0)
+            self._readers[uid] = self._readers.get(uid, 0) + 1
+        try:
+            doc = self.collection.find_one(query or {"uid": uid}, self.projection)
+        finally:
+            with self._lock:
+                current = self._generations.get(uid, 0) == generation
+                if current:
+                    self._cache.set(uid, doc, ttl=None if doc is not None else self.miss_ttl)
+                    if doc is not None:
+                        self._uids_by_id.set(doc["_id"], uid)
+                self._readers[uid] -= 1
+                if not self._readers[uid]:
+                    del self._readers[uid]
+                    self._generations.pop(uid, None)
+        if not current:
+            self.stats["stale_reads"] += 1
+        return copy.deepcopy(doc)
+
+    def invalidate(self, uid):
+        self.stats["invalidations"] += 1
+        with self._lock:
+            if uid in self._readers:
+                self._generations[uid] = self._generations.get(uid, 0) + 1
+            self._cache.delete(uid)
+
+    def _watch(self):
+        backoff = 1
+        while True:
+            try:
+                with self.collection.watch(full_document="updateLookup") as stream:
+                    if backoff > 1:
+                        # Changes made while disconnected were missed
+                        self._cache.clear()
+                    backoff = 1
+                    for change in stream:
+                        uid = (change.get("fullDocument") or {}).get("uid")
+                        if uid is None:
+                            # Deletes carry only the _id
+                            document_id = change.get("documentKey", {}).get("_id")
+                            uid = self._uids_by_id.get(document_id)
+                            self._uids_by_id.delete(document_id)
+                        if uid is not None:
+                            self.invalidate(uid)
+            except PyMongoError as e:
+                self.stats["watch_errors"] += 1
+                print(f"Profile change stream unavailable, relying on TTL; retrying in {backoff}s: {str(e)}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, WATCH_MAX_BACKOFF)
+
+    def watch(self):
+        """Start invalidating from the collection's change stream in the background."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="profile-cache-watch", daemon=True)
+            self._watcher.start()
+
+def make_profile_cache(collection, projection=None):
+    cache = ProfileCache(
+        collection,
+        maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "5000")),
+        ttl=int(os.getenv("PROFILE_CACHE_TTL", "300")),
+        miss_ttl=int(os.getenv("PROFILE_CACHE_MISS_TTL", "5")),
+        projection=projection,
+    )
+    if os.getenv("PROFILE_CACHE_WATCH", "true").lower() == "true":
+        cache.watch()
+    return cache
@@ -0,0 +1,182 @@
+import contextvars
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from flask import g, request
+
+load_dotenv()
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_ENDPOINTS = {e.strip() for e in os.getenv("PROFILE_ENDPOINTS", "chat,create_profile").split(",") if e.strip()}
+PROFILE_HEADER = "X-Profile"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.collapsed$")
+
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of the request thread, and of pool threads while
+    they run work submitted for the request through tracer.submit (sub-agents,
+    hedged GETs, the early search), every `interval` seconds from a helper
+    thread, and counts identical stacks. Each stack starts with the thread it
+    ran on. Work on other pools (job prefetch) and single-flight leaders serving
+    another request are not included. The profiled code runs untouched, so the
+    overhead is one stack walk per thread per interval. Output is in
+    collapsed-stack format ("outer;inner count" per line), which flamegraph.pl
+    and speedscope read.
+    """
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._threads = {thread_id: "request"}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def attach(self, thread_id, name):
+        with self._lock:
+            self._threads[thread_id] = name
+
+    def detach(self, thread_id):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for thread_id, name in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+@contextmanager
+def profiled_thread():
+    """Include the current (pool) thread in the active request's profile while the block runs.
+    Relies on the caller's context having been copied in, as tracer.submit does."""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    thread = threading.current_thread()
+    profiler.attach(thread.ident, thread.name.rsplit("_", 1)[0])
+    try:
+        yield
+    finally:
+        profiler.detach(thread.ident)
+
+def sign_profile_request(expires_at, secret=PROFILE_SECRET):
+    """The X-Profile header value that opts a request into profiling until `expires_at` (unix time)."""
+    signature = hmac.new(secret.encode("utf-8"), str(int(expires_at)).encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{int(expires_at)}.{signature}"
+
+def valid_signature(header):
+    if not PROFILE_SECRET or not header or "." not in header:
+        return False
+    expires_at, _ = header.split(".", 1)
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(header, sign_profile_request(int(expires_at)))
+
+def should_profile():
+    if request.endpoint not in PROFILE_ENDPOINTS:
+        return False
+    return valid_signature(request.headers.get(PROFILE_HEADER)) or random.random() < PROFILE_SAMPLE_RATE
+
+def list_profiles():
+    """Stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if PROFILE_NAME.match(name):
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            profiles.append({"name": name, "bytes": stat.st_size, "created_at": stat.st_mtime})
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+def profile_path(name):
+    """Path of a stored profile, or None for names that are not profiles."""
+    path = os.path.join(PROFILE_DIR, name)
+    return path if PROFILE_NAME.match(name) and os.path.isfile(path) else None
+
+def _save(profiler, endpoint, duration_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}_{endpoint}_{duration_ms}ms_{uuid.uuid4().hex[:8]}.collapsed"
+    with open(os.path.join(PROFILE_DIR, name), "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    # Keep the directory bounded: drop the oldest profiles
+    for old in list_profiles()[PROFILE_MAX_FILES:]:
+        os.remove(os.path.join(PROFILE_DIR, old["name"]))
+    return name
+
+def _start():
+    if should_profile():
+        g.profiler = SamplingProfiler(threading.get_ident())
+        g.profile_started = time.perf_counter()
+        _active_profiler.set(g.profiler)
+        g.profiler.start()
+
+def _stop_and_save(endpoint):
+    """Stop this request's sampler (if any) and save its profile; returns the profile name."""
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return None
+    profiler.stop()
+    _active_profiler.set(None)
+    duration_ms = int((time.perf_counter() - g.pop("profile_started")) * 1000)
+    try:
+        return _save(profiler, endpoint, duration_ms)
+    except OSError as e:
+        print(f"Could not save profile: {e}")
+        return None
+
+def _finish(response):
+    name = _stop_and_save(request.endpoint)
+    if name:
+        response.headers["X-Profile-Id"] = name
+    return response
+
+def _teardown(error=None):
+    # after_request does not run when the view raises; teardown always does,
+    # so the sampler thread never outlives its request
+    _stop_and_save(f"{request.endpoint}_error" if error else request.endpoint)
+
+def init_profiling(app):
+    """Profile requests to PROFILE_ENDPOINTS that carry a valid signed X-Profile header,
+    plus a PROFILE_SAMPLE_RATE fraction of the rest."""
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_teardown)
@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+load_dotenv()
+
+def refill(tokens, updated, now, rate, capacity):
+    """Tokens in a bucket at `now`, given its level at `updated` and a refill rate per second."""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+class InMemoryBackend:
+    """Token buckets held in this process only. Buckets idle long enough to be
+    full again are dropped (a missing bucket starts full), so memory follows
+    the number of recently active clients rather than every client ever seen."""
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def _prune(self, now, rate, capacity):
+        idle = capacity / rate
+        if now - self._last_prune < idle:
+            return
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < idle}
+        self._last_prune = now
+
+    def take(self, key, rate, capacity, cost=1):
+        """Take `cost` tokens; returns (allowed, seconds until enough tokens)."""
+        now = time.time()
+        with self._lock:
+            self._prune(now, rate, capacity)
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, rate, capacity)
+            allowed = tokens >= cost
+            self._buckets[key] = (tokens - cost if allowed else tokens, now)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+class MongoBackend:
+    """
+    Token buckets in a Mongo collection so limits hold across workers. Each
+    update is a compare-and-swap on the bucket's `updated` stamp; under heavy
+    contention or when Mongo is unreachable the request is let through.
+    """
+    def __init__(self, collection, max_attempts=5):
+        self.collection = collection
+        self.max_attempts = max_attempts
+        # Idle buckets are removed by Mongo once they would be full again anyway
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def take(self, key, rate, capacity, cost=1):
+        try:
+            for _ in range(self.max_attempts):
+                now = time.time()
+                expires_at = datetime.utcnow() + timedelta(seconds=capacity / rate)
+                doc = self.collection.find_one({"_id": key})
+                if doc is None:
+                    try:
+                        self.collection.insert_one({"_id": key, "tokens": capacity - cost, "updated": now, "expires_at": expires_at})
+                        return True, 0.0
+                    except DuplicateKeyError:
+                        continue
+
+                tokens = refill(doc["tokens"], doc["updated"], now, rate, capacity)
+                allowed = tokens >= cost
+                result = self.collection.update_one(
+                    {"_id": key, "updated": doc["updated"]},
+                    {"$set": {"tokens": tokens - cost if allowed else tokens, "updated": now, "expires_at": expires_at}},
+                )
+                if result.modified_count:
+                    return allowed, 0.0 if allowed else (cost - tokens) / rate
+        except PyMongoError as e:
+            print(f"Rate limit backend error: {str(e)}")
+        return True, 0.0
+
+class ConcurrencyLimiter:
+    """Caps in-flight LLM-backed requests in this process; waiters give up after `deadline` seconds."""
+    def __init__(self, limit, deadline):
+        self.limit = limit
+        self.deadline = deadline
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self.stats = {"admitted": 0, "shed": 0}
+
+    def acquire(self):
+        admitted = self._semaphore.acquire(timeout=self.deadline)
+        self.stats["admitted" if admitted else "shed"] += 1
+        return admitted
+
+    def release(self):
+        self._semaphore.release()
+
+class RateLimiter:
+    """Per-user/IP token buckets on a pluggable backend, plus the global concurrency limit."""
+    def __init__(self, backend, rate, burst, concurrency):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.stats = {"allowed": 0, "limited": 0}
+
+    def check(self, key):
+        """Returns (allowed, Retry-After seconds as an int)."""
+        allowed, wait_seconds = self.backend.take(key, self.rate, self.burst)
+        self.stats["allowed" if allowed else "limited"] += 1
+        return allowed, max(1, math.ceil(wait_seconds))
+
+    def snapshot(self):
+        return {**self.stats, "concurrency": dict(self.concurrency.stats)}
+
+def _make_backend():
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "mongo":
+        from db import db
+        return MongoBackend(db["rate_limits"])
+    return InMemoryBackend()
+
+rate_limiter = RateLimiter(
+    _make_backend(),
+    rate=float(os.getenv("RATE_LIMIT_PER_MINUTE", "30")) / 60,
+    burst=float(os.getenv("RATE_LIMIT_BURST", "10")),
+    concurrency=ConcurrencyLimiter(
+        int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        float(os.getenv("LLM_QUEUE_DEADLINE", "5")),
+    ),
+)
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from deadline import HTTP_TIMEOUT, DeadlineExceeded, expired, time_left
+from tracing import tracer
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+class CircuitBreaker:
+    """
+    A per-upstream circuit breaker. Over a rolling window of recent calls it
+    opens when the failure rate or the slow-call rate crosses its threshold.
+    While open, calls fail fast with CircuitOpenError. After `open_seconds` it
+    goes half-open and lets `half_open_calls` probes through; a healthy probe
+    closes it again, a failed or slow one re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_rate=0.5, slow_call_rate=0.8, slow_call_seconds=5.0,
+                 window=20, min_calls=5, open_seconds=30.0, half_open_calls=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=200)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def release_probe(self):
+        """Give back a half-open probe slot whose call ended without a verdict."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        print(f"Circuit for {self.name} opened")
+
+    def record(self, success, duration):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            self.stats["calls"] += 1
+            if not success:
+                self.stats["failures"] += 1
+            self._latencies.append(duration)
+
+            if self.state == self.HALF_OPEN:
+                if success and not slow:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append((success, slow))
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                total = len(self._outcomes)
+                failures = sum(1 for ok, _ in self._outcomes if not ok)
+                slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+                if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                    self._open()
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn through the breaker; raises CircuitOpenError without calling fn when open.
+        A failure after the request's deadline ran out is not held against the upstream:
+        it is raised as DeadlineExceeded and not recorded.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable")
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if expired():
+                self.release_probe()
+                raise DeadlineExceeded("Request deadline exceeded") from e
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def p95(self, min_samples=20):
+        """p95 latency of recent calls in seconds, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def snapshot(self):
+        return {"state": self.state, "p95": self.p95(), **self.stats}
+
+def _breaker(name, slow_call_seconds):
+    prefix = f"BREAKER_{name.upper()}_"
+    return CircuitBreaker(
+        name,
+        failure_rate=float(os.getenv(prefix + "FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv(prefix + "SLOW_SECONDS", str(slow_call_seconds))),
+        open_seconds=float(os.getenv(prefix + "OPEN_SECONDS", "30")),
+    )
+
+breakers = {
+    "herkey": _breaker("herkey", 5.0),
+    "tavily": _breaker("tavily", 10.0),
+    "profanity": _breaker("profanity", 3.0),
+}
+_breakers_lock = threading.Lock()
+LLM_SLOW_SECONDS = {"openai": 20.0, "cohere": 30.0}
+
+def get_llm_breaker(provider, model):
+    """The breaker for one LLM model (e.g. "openai:gpt-4.1-nano"), created on first use.
+    Models get their own breakers so one failing model does not cut off the rest of its provider."""
+    name = f"{provider}:{model}"
+    with _breakers_lock:
+        if name not in breakers:
+            breakers[name] = _breaker(provider, LLM_SLOW_SECONDS.get(provider, 20.0))
+            breakers[name].name = name
+        return breakers[name]
+
+# Hedged requests
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "16"))
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+# Attempts only go to the pool when a worker is free, so no request ever queues
+# behind a slow upstream's attempts
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+hedge_stats = {"requests": 0, "hedged": 0, "hedge_won": 0, "pool_full": 0}
+_hedge_stats_lock = threading.Lock()
+MIN_HEDGE_DELAY = 0.05
+
+def _count_hedge(stat):
+    with _hedge_stats_lock:
+        hedge_stats[stat] += 1
+
+def _get(url, timeout, **kwargs):
+    resp = requests.get(url, timeout=timeout, **kwargs)
+    # Only server errors count as failures; 4xx are answers the caller handles
+    if resp.status_code >= 500:
+        resp.raise_for_status()
+    return resp
+
+def _submit_attempt(url, timeout, kwargs):
+    """Start one attempt on a free pool worker; None if every worker is busy."""
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+    future = tracer.submit(_hedge_executor, _get, url, timeout, **kwargs)
+    future.add_done_callback(lambda _: _hedge_slots.release())
+    return future
+
+def guarded_get(breaker, url, **kwargs):
+    """
+    A single GET through `breaker` on the caller's thread, for requests that must
+    not be sent twice (minting a session). Times out like hedged_get.
+    """
+    return breaker.call(_get, url, time_left(kwargs.pop("timeout", HTTP_TIMEOUT)), **kwargs)
+
+def hedged_get(breaker, url, **kwargs):
+    """
+    An idempotent GET through `breaker`. If the first attempt has not answered
+    by the breaker's p95 latency, a duplicate request is sent and whichever
+    finishes first (successfully) wins. Without enough samples for a p95, or
+    with every hedge worker busy, the request is sent once from the caller's
+    thread. The request times out after `timeout` (HTTP_TIMEOUT by default) or
+    whatever is left of the request's deadline, if sooner; the hedge only gets
+    what is left of that, and the caller never waits past it.
+    """
+    timeout = time_left(kwargs.pop("timeout", HTTP_TIMEOUT))
+    expires_at = time.monotonic() + timeout
+
+    def send():
+        _count_hedge("requests")
+        p95 = breaker.p95()
+        first = None
+        if p95 is not None:
+            first = _submit_attempt(url, timeout, kwargs)
+            if first is None:
+                _count_hedge("pool_full")
+        if first is None:
+            return _get(url, timeout, **kwargs)
+
+        pending = {first}
+        done, _ = wait(pending, timeout=max(p95, MIN_HEDGE_DELAY))
+        second = None
+        hedge_left = expires_at - time.monotonic()
+        # Hedge unless the first answered, there is no time worth hedging with or no free worker
+        if not done and hedge_left > MIN_HEDGE_DELAY:
+            second = _submit_attempt(url, hedge_left, kwargs)
+            if second is None:
+                _count_hedge("pool_full")
+            else:
+                _count_hedge("hedged")
+                pending.add(second)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, expires_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise requests.exceptions.Timeout(f"No response from {url} within {timeout:.2f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        _count_hedge("hedge_won")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    return breaker.call(send)
+
+def _hedge_snapshot():
+    with _hedge_stats_lock:
+        return dict(hedge_stats)
+
+def resilience_stats():
+    return {
+        "circuit_breakers": {name: breaker.snapshot() for name, breaker in breakers.items()},
+        "hedging": _hedge_snapshot(),
+    }
@@ -0,0 +1,81 @@
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Words that carry no meaning for matching FAQ-style questions
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "you", "your", "is", "are", "am", "be", "do", "does",
+    "can", "could", "should", "would", "how", "what", "to", "for", "of", "in", "on", "and", "or",
+    "please", "tell", "about", "some", "any", "give",
+}
+
+def embed(text, dim):
+    """
+    A hashing-vectorizer embedding computed locally: word unigrams, word bigrams
+    and character trigrams are hashed (crc32, stable across processes) into `dim`
+    signed buckets, then L2-normalized.
+    """
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Caches answers by meaning rather than exact text. Embeddings live in one
+    preallocated NumPy matrix, so a lookup is a single matrix-vector product
+    followed by a top-1 cosine match against `threshold`. Entries expire after
+    `ttl` seconds; when full, the least recently used entry is replaced.
+    """
+    def __init__(self, threshold=0.9, ttl=86400, capacity=1000, dim=2048):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.capacity = capacity
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._values = [None] * capacity
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def lookup(self, text):
+        """Return the cached value for the closest live entry, or None."""
+        vector = embed(text, self.dim)
+        now = time.time()
+        with self._lock:
+            scores = self._vectors @ vector
+            scores[self._expires <= now] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self._last_used[best] = now
+            self.stats["hits"] += 1
+            return self._values[best]
+
+    def add(self, text, value):
+        vector = embed(text, self.dim)
+        if not vector.any():
+            return
+        now = time.time()
+        with self._lock:
+            # Reuse an expired (or never used) slot first, otherwise evict the LRU entry
+            expired = np.flatnonzero(self._expires <= now)
+            slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._values[slot] = value
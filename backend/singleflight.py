@@ -0,0 +1,85 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+
+from deadline import DeadlineExceeded, remaining, time_left
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the
+    function, and callers arriving while it is in flight wait for its result
+    instead of making their own upstream call. A waiter that is not served
+    within `timeout` seconds (or its request's deadline) stops waiting and makes
+    the call itself, unless the deadline has passed. If the leader fails only
+    because its own deadline passed, waiters with time left retry. Every
+    caller, the leader included, gets its own copy of the result, so nobody
+    mutates a shared one.
+    """
+    def __init__(self, name, timeout=30.0):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "wait_timeouts": 0, "retries": 0}
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            if call.done.wait(time_left(self.timeout if timeout is None else timeout)):
+                if call.error is not None:
+                    # The leader ran out of its own budget; a waiter that still has time tries again
+                    if isinstance(call.error, DeadlineExceeded) and remaining() != 0:
+                        with self._lock:
+                            self.stats["retries"] += 1
+                        return self.do(key, fn, *args, timeout=timeout, **kwargs)
+                    raise call.error
+                return copy.deepcopy(call.result)
+            with self._lock:
+                self.stats["wait_timeouts"] += 1
+            # The wait may have used up the request's budget; then there is no time to call it ourselves
+            if remaining() == 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            return fn(*args, **kwargs)
+
+        try:
+            call.result = fn(*args, **kwargs)
+            # Waiters may be copying call.result right now, so the leader must not hand it out either
+            return copy.deepcopy(call.result)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+def make_key(*parts):
+    """A stable key for JSON-serializable parts (dict key order does not matter)."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# Shared groups for the upstreams we call
+herkey_flight = SingleFlight("herkey", timeout=float(os.getenv("SINGLEFLIGHT_HERKEY_TIMEOUT", "15")))
+search_flight = SingleFlight("tavily", timeout=float(os.getenv("SINGLEFLIGHT_SEARCH_TIMEOUT", "20")))
+llm_flight = SingleFlight("llm", timeout=float(os.getenv("SINGLEFLIGHT_LLM_TIMEOUT", "60")))
+
+def singleflight_stats():
+    """Per-group counters, including how many calls were coalesced."""
+    return {group.name: dict(group.stats) for group in (herkey_flight, search_flight, llm_flight)}
@@ -0,0 +1,75 @@
+import json
+import os
+import re
+
+SKILLS_FILE = os.getenv("SKILLS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "skills.json"))
+
+class SkillIndex:
+    """
+    The skill taxonomy from data/skills.json: canonical skills by category, each
+    with its aliases ("sklearn" -> "scikit-learn", "k8s" -> "kubernetes"). Every
+    surface form is compiled into one regex, so finding the skills in a resume
+    or a chat message is a single scan. Terms listed as ambiguous ("go", "r")
+    are ordinary words too and can be left out when matching free-form queries.
+    """
+    def __init__(self, taxonomy):
+        self.version = taxonomy.get("version")
+        self.categories = {}
+        self._canonical = {}
+        for category, skills in taxonomy["categories"].items():
+            for skill, aliases in skills.items():
+                # A skill listed twice keeps its first category
+                self.categories.setdefault(skill, category)
+                for term in [skill, *aliases]:
+                    self._canonical.setdefault(term.lower(), skill)
+        self.ambiguous = {term.lower() for term in taxonomy.get("ambiguous", [])}
+        self._display = taxonomy.get("display", {})
+        # Longest terms first, so "react native" wins over "react"
+        terms = sorted(self._canonical, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<![\w+#])(" + "|".join(re.escape(term) for term in terms) + r")(?![\w+#])",
+            re.IGNORECASE,
+        )
+
+    @classmethod
+    def load(cls, path=SKILLS_FILE):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def canonical(self, term):
+        """The canonical name for a skill or alias, or None if it is not in the taxonomy."""
+        return self._canonical.get(term.strip().lower())
+
+    def find(self, text, include_ambiguous=True):
+        """Canonical skills mentioned in the text, in order of first mention."""
+        found = []
+        for match in self._pattern.finditer(text):
+            term = match.group(1).lower()
+            if not include_ambiguous and term in self.ambiguous:
+                continue
+            skill = self._canonical[term]
+            if skill not in found:
+                found.append(skill)
+        return found
+
+    def canonicalize(self, text, include_ambiguous=True):
+        """The text with each skill alias replaced by its canonical name ("sklearn jobs" -> "scikit-learn jobs")."""
+        def replace(match):
+            term = match.group(1).lower()
+            if not include_ambiguous and term in self.ambiguous:
+                return match.group(0)
+            return self._canonical[term]
+        return self._pattern.sub(replace, text)
+
+    def display(self, skill):
+        return self._display.get(skill) or " ".join(word.capitalize() for word in skill.split())
+
+    def categorize(self, skills):
+        """Display names grouped by category, in taxonomy order."""
+        categorized = {}
+        for skill in skills:
+            categorized.setdefault(self.categories[skill], []).append(self.display(skill))
+        order = list(dict.fromkeys(self.categories.values()))
+        return {category: categorized[category] for category in order if category in categorized}
+
+skill_index = SkillIndex.load()
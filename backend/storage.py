@@ -0,0 +1,117 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+
+class UploadTooLarge(Exception):
+    """Raised when an upload passes the byte limit; nothing is stored."""
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    sha256: str
+
+def read_chunks(stream, max_bytes, hasher):
+    """Yield the stream in chunks, hashing as they pass and stopping past max_bytes."""
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+        hasher.update(chunk)
+        yield chunk
+
+def object_key(sha256, extension):
+    return f"{sha256}.{extension}" if extension else sha256
+
+class LocalStorage:
+    """Content-addressed files under `root` (one directory level by hash prefix)."""
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def save(self, stream, extension="", max_bytes=UPLOAD_MAX_BYTES):
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in read_chunks(stream, max_bytes, hasher):
+                    tmp.write(chunk)
+                    size += len(chunk)
+            key = object_key(hasher.hexdigest(), extension)
+            path = self._path(key)
+            if os.path.exists(path):
+                # Same content already stored
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return StoredObject(key, size, hasher.hexdigest())
+
+    def open(self, key):
+        return open(self._path(key), "rb")
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+class GridFSStorage:
+    """Content-addressed files in a GridFS bucket, shared by every worker and instance."""
+    def __init__(self, database, bucket_name="uploads"):
+        from gridfs import GridFSBucket
+        self.bucket = GridFSBucket(database, bucket_name=bucket_name)
+
+    def save(self, stream, extension="", max_bytes=UPLOAD_MAX_BYTES):
+        hasher = hashlib.sha256()
+        size = 0
+        # The key is only known once every byte is hashed, so upload under a
+        # provisional name and rename (or drop, if a duplicate) at the end
+        upload = self.bucket.open_upload_stream(f"pending-{os.urandom(8).hex()}")
+        try:
+            for chunk in read_chunks(stream, max_bytes, hasher):
+                upload.write(chunk)
+                size += len(chunk)
+            upload.close()
+        except BaseException:
+            upload.abort()
+            raise
+
+        key = object_key(hasher.hexdigest(), extension)
+        if self.exists(key):
+            self.bucket.delete(upload._id)
+        else:
+            self.bucket.rename(upload._id, key)
+        return StoredObject(key, size, hasher.hexdigest())
+
+    def open(self, key):
+        # GridOut is a seekable file object, so parsers can read it directly
+        return self.bucket.open_download_stream_by_name(key)
+
+    def exists(self, key):
+        return next(iter(self.bucket.find({"filename": key}).limit(1)), None) is not None
+
+def make_storage():
+    if os.getenv("STORAGE_BACKEND", "local") == "gridfs":
+        from db import db
+        return GridFSStorage(db)
+    return LocalStorage(os.getenv("UPLOAD_FOLDER", "uploads"))
+
+upload_storage = make_storage()
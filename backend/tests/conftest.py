@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Settings the modules read at import time: no real services, no background watchers
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("COHERE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+os.environ.setdefault("PROFILE_CACHE_WATCH", "false")
+os.environ.setdefault("CONVERSATION_WRITE_MODE", "sync")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.py connects at import time; point it at an in-memory Mongo
+mongomock = pytest.importorskip("mongomock")
+import pymongo  # noqa: E402
+
+pymongo.MongoClient = mongomock.MongoClient
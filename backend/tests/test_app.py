@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app as app_module
+import db
+import middleware
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+def test_weak_if_none_match_on_a_compressed_page_skips_mongo(client, monkeypatch):
+    for i in range(3):
+        db.save_conversation("etag-user", f"message {i}", {"text": "x" * 1000})
+    first = client.get("/api/conversations?user_id=etag-user", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].startswith('W/"')
+
+    def no_mongo(*args, **kwargs):
+        raise AssertionError("Mongo was read")
+
+    monkeypatch.setattr(app_module, "get_conversation_page", no_mongo)
+    second = client.get("/api/conversations?user_id=etag-user",
+                        headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+
+@pytest.fixture
+def local_time_ahead_of_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_conversation_timestamps_are_sent_as_utc(client, local_time_ahead_of_utc):
+    db.save_conversation("utc-user", "hello", {"text": "hi"})
+    sent = client.get("/api/conversations?user_id=utc-user").get_json()
+    timestamp = datetime.fromisoformat(sent["conversations"][0]["timestamp"])
+    assert abs(timestamp - datetime.now(timezone.utc)) < timedelta(minutes=1)
+
+def test_login_that_outlasts_the_password_pool_gets_503(client, monkeypatch):
+    credentials = {"email": "slow@example.com", "password": "hunter22"}
+    assert client.post("/api/signup", json={"username": "slow", **credentials}).status_code == 200
+
+    class StalledPool:
+        def submit(self, fn, *args):
+            return Future()
+
+    monkeypatch.setattr(db.password_hasher, "start", StalledPool)
+    monkeypatch.setattr(db.password_hasher, "timeout", 0.01)
+    response = client.post("/api/login", json=credentials)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+def test_rate_limit_key_uses_the_bearer_tokens_user(client):
+    signup = client.post("/api/signup", json={"username": "keyed", "email": "keyed@example.com", "password": "hunter22"}).get_json()
+    with app_module.app.test_request_context(headers={"Authorization": f"Bearer {signup['token']}"}):
+        assert middleware._client_key() == f"user:{signup['user_id']}"
@@ -0,0 +1,62 @@
+import db
+from write_behind import WriteBehindBuffer
+
+class FlushAfterQuery:
+    """A collection whose find() runs the query, then lets the buffer flush before
+    handing the results back: the flusher winning the race between the two reads."""
+    def __init__(self, collection, buffer):
+        self.collection = collection
+        self.buffer = buffer
+
+    def find(self, *args, **kwargs):
+        return _FlushingCursor(self.collection.find(*args, **kwargs), self.buffer)
+
+class _FlushingCursor:
+    def __init__(self, cursor, buffer):
+        self.cursor = cursor
+        self.buffer = buffer
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    def __iter__(self):
+        docs = list(self.cursor)
+        self.buffer.flush()
+        return iter(docs)
+
+def test_page_includes_conversation_flushed_between_reads(monkeypatch):
+    collection = db.db["conversations_race"]
+    buffer = WriteBehindBuffer(collection, flush_interval=60)
+    monkeypatch.setattr(db, "conversations", FlushAfterQuery(collection, buffer))
+    monkeypatch.setattr(db, "conversation_buffer", buffer)
+    try:
+        convo_id = db.save_conversation("race-user", "hello", {"text": "hi"})
+        page, _ = db.get_conversation_page("race-user", limit=5)
+        assert [str(convo["_id"]) for convo in page] == [convo_id]
+        # Written now, and still listed once
+        page, _ = db.get_conversation_page("race-user", limit=5)
+        assert [str(convo["_id"]) for convo in page] == [convo_id]
+    finally:
+        buffer.close()
+
+def test_pages_merge_buffered_and_stored_without_duplicates(monkeypatch):
+    collection = db.db["conversations_merge"]
+    buffer = WriteBehindBuffer(collection, flush_interval=60)
+    monkeypatch.setattr(db, "conversations", collection)
+    monkeypatch.setattr(db, "conversation_buffer", buffer)
+    try:
+        ids = [db.save_conversation("merge-user", f"message {i}", {"text": ""}) for i in range(3)]
+        buffer.flush()
+        ids += [db.save_conversation("merge-user", f"message {i}", {"text": ""}) for i in range(3, 5)]
+
+        first, cursor = db.get_conversation_page("merge-user", limit=3)
+        second, end = db.get_conversation_page("merge-user", limit=3, cursor=cursor)
+        assert end is None
+        assert [str(convo["_id"]) for convo in first + second] == ids[::-1]
+    finally:
+        buffer.close()
@@ -0,0 +1,80 @@
+import agent
+from deadline import deadline
+
+def search(**params):
+    return {"keyword": "python developer", "location_name": "Pune", "page_no": 1, "page_size": 15, **params}
+
+def test_job_search_error_leaves_results_out_and_marks_degraded(monkeypatch):
+    monkeypatch.setattr(agent, "get_job_search_results", lambda params, view=None: {"error": "HerKey is down"})
+    monkeypatch.setattr(agent, "get_herkey_token", lambda: "token")
+    with deadline() as budget:
+        response = agent.format_response("job_search", "python jobs in Pune", search(keyword="error case"))
+
+    utils = response["canvasUtils"]
+    assert "job_results" not in utils
+    assert utils["job_link"]
+    assert utils["next_cursor"] == 1
+    assert response["text"].startswith("I've set up a search")
+    assert budget.degraded == ["job_results"]
+
+def test_empty_job_search_is_final(monkeypatch):
+    monkeypatch.setattr(agent, "get_job_search_results", lambda params, view=None: {"body": []})
+    monkeypatch.setattr(agent, "get_herkey_token", lambda: "token")
+    with deadline() as budget:
+        response = agent.format_response("job_search", "python jobs in Pune", search(keyword="empty case"))
+
+    assert response["canvasUtils"]["job_results"] == []
+    assert response["canvasUtils"]["next_cursor"] is None
+    assert not budget.degraded
+
+def test_session_fetch_failure_leaves_results_out(monkeypatch):
+    def unavailable(category):
+        raise RuntimeError("HerKey is down")
+    monkeypatch.setattr(agent, "get_session_widgets", unavailable)
+    with deadline() as budget:
+        response = agent.format_response("events", "any workshops this week", None)
+
+    assert "session_results" not in response["canvasUtils"]
+    assert response["canvasUtils"]["session_link"]
+    assert budget.degraded == ["events"]
+
+def test_no_sessions_is_final(monkeypatch):
+    monkeypatch.setattr(agent, "get_session_widgets", lambda category: [])
+    response = agent.format_response("events", "any workshops this week", None)
+    assert response["canvasUtils"]["session_results"] == []
+
+def fake_models(monkeypatch, classify):
+    """LLM calls answered locally: classify() gives the classifier's reply (or raises), text gets a fixed answer."""
+    def invoke(messages, task, fallback=None):
+        if task == "classify":
+            return agent.AIMessage(content=classify())
+        return agent.AIMessage(content="An answer")
+    monkeypatch.setattr(agent, "invoke_chat_model", invoke)
+
+def failing():
+    raise RuntimeError("every model failed")
+
+def test_confident_normal_text_is_cached(monkeypatch):
+    fake_models(monkeypatch, lambda: '[{"intent": "normal_text"}]')
+    agent.run_agent("what does a scrum master do all day")
+    assert agent.text_response_cache.lookup("what does a scrum master do all day") == "An answer"
+
+def test_classifier_failure_is_not_cached(monkeypatch):
+    fake_models(monkeypatch, failing)
+    with deadline() as budget:
+        response = agent.run_agent("openings for actuaries in kolkata")
+    assert response["text"] == "An answer"
+    assert "classify" in budget.degraded
+    assert agent.text_response_cache.lookup("openings for actuaries in kolkata") is None
+
+def test_unparseable_classification_is_not_cached(monkeypatch):
+    fake_models(monkeypatch, lambda: "I am not sure")
+    agent.run_agent("roadmap for becoming a sommelier")
+    assert agent.text_response_cache.lookup("roadmap for becoming a sommelier") is None
+
+def test_degraded_turn_is_not_cached(monkeypatch):
+    fake_models(monkeypatch, lambda: '[{"intent": "normal_text"}]')
+    with deadline():
+        agent.mark_degraded("history")
+        agent.run_agent("tips for a first salary negotiation")
+    assert agent.text_response_cache.lookup("tips for a first salary negotiation") is None
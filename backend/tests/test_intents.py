@@ -0,0 +1,26 @@
+import agent
+
+def test_json_array_gives_each_intent_its_part():
+    intents = agent.parse_intents('Sure: [{"intent": "job_search", "query": "jobs in Pune"}, {"intent": "events"}]', "jobs in Pune and events")
+    assert intents == [
+        {"intent": "job_search", "query": "jobs in Pune"},
+        {"intent": "events", "query": "jobs in Pune and events"},
+    ]
+
+def test_bare_category_name_is_accepted():
+    assert agent.parse_intents("`roadmap`", "learn ML") == [{"intent": "roadmap", "query": "learn ML"}]
+
+def test_category_mentioned_in_prose_falls_back_to_text():
+    assert agent.parse_intents("this is not a job_search", "hello") == [{"intent": "normal_text", "query": "hello", "fallback": True}]
+
+def test_normal_text_only_stands_alone():
+    intents = agent.parse_intents('[{"intent": "normal_text"}, {"intent": "roadmap"}, {"intent": "roadmap"}]', "q")
+    assert intents == [{"intent": "roadmap", "query": "q"}]
+
+def test_merge_keeps_all_text_and_the_first_canvas():
+    merged = agent.merge_responses([
+        {"text": "Some advice", "canvasType": "none", "canvasUtils": {}},
+        {"text": "Jobs", "canvasType": "jobs", "canvasUtils": {"job_link": "a"}},
+        {"text": "Events", "canvasType": "sessions", "canvasUtils": {"session_link": "b"}},
+    ])
+    assert merged == {"text": "Some advice\n\nJobs\n\nEvents", "canvasType": "jobs", "canvasUtils": {"job_link": "a"}}
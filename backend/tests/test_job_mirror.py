@@ -0,0 +1,82 @@
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import agent
+from job_mirror import JobMirror, is_expired
+from tools.api_client import HerkeyAPIClient
+from tools.fake_herkey import FakeHerkeyHandler, make_jobs
+
+@pytest.fixture(scope="module")
+def fake_herkey():
+    FakeHerkeyHandler.jobs = make_jobs(200)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHerkeyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield HerkeyAPIClient(f"http://127.0.0.1:{server.server_port}/api/v1/herkey")
+    server.shutdown()
+
+def harvested(client, max_pages):
+    mirror = JobMirror(client=client, interval=600, page_size=50, max_pages=max_pages, max_age=600)
+    mirror.harvest()
+    return mirror
+
+def active_with_skill(skill):
+    return [job for job in FakeHerkeyHandler.jobs if skill in job["skills"] and not is_expired(job)]
+
+def test_complete_mirror_answers_searches(fake_herkey):
+    mirror = harvested(fake_herkey, max_pages=10)
+    assert mirror.complete
+
+    result = mirror.search({"keyword": "sql", "page_no": 1, "page_size": 15})
+    assert result["source"] == "mirror"
+    assert result["pagination"]["total_items"] == len(active_with_skill("sql"))
+    assert all("sql" in job["skills"] for job in result["body"])
+
+def test_miss_returns_none(fake_herkey):
+    mirror = harvested(fake_herkey, max_pages=10)
+    assert mirror.search({"keyword": "astronaut", "page_no": 1, "page_size": 15}) is None
+
+def scarce_title(mirror):
+    """A title the partial mirror has fewer than a page of listings for, and the count."""
+    counts = Counter(job["title"] for job in mirror.jobs.values())
+    return next((title, count) for title, count in counts.items() if count < 15)
+
+def test_partial_mirror_misses_when_it_cannot_fill_the_page(fake_herkey):
+    mirror = harvested(fake_herkey, max_pages=1)
+    assert not mirror.complete
+    assert len(mirror.jobs) <= 50
+
+    title, count = scarce_title(mirror)
+    assert mirror.search({"keyword": title, "page_no": 1, "page_size": 15}) is None
+    # A page the partial mirror can fill is still served from it
+    assert mirror.search({"keyword": title, "page_no": 1, "page_size": count})["source"] == "mirror"
+
+def test_job_search_falls_back_to_herkey_on_a_mirror_miss(fake_herkey, monkeypatch):
+    mirror = harvested(fake_herkey, max_pages=1)
+    title, _ = scarce_title(mirror)
+    monkeypatch.setattr(agent.Config, "JOB_MIRROR_ENABLED", True)
+    monkeypatch.setattr(agent, "job_mirror", mirror)
+    fetched = []
+
+    def fetch(params):
+        fetched.append(params)
+        return fake_herkey.es_candidate_jobs(params)
+
+    monkeypatch.setattr(agent, "_fetch_candidate_jobs", fetch)
+    params = {"keyword": title.lower(), "page_no": 1, "page_size": 15, "is_global_query": "false"}
+    result = agent.get_job_search_results(params, view=None)
+
+    assert fetched == [params]
+    assert "source" not in result
+    assert result["body"] and all(job["title"] == title for job in result["body"])
+
+def test_job_search_uses_the_mirror_on_a_hit(fake_herkey, monkeypatch):
+    monkeypatch.setattr(agent.Config, "JOB_MIRROR_ENABLED", True)
+    monkeypatch.setattr(agent, "job_mirror", harvested(fake_herkey, max_pages=10))
+    monkeypatch.setattr(agent, "_fetch_candidate_jobs", lambda params: pytest.fail("HerKey was called"))
+
+    result = agent.get_job_search_results({"keyword": "sql", "page_no": 1, "page_size": 15}, view=None)
+    assert result["source"] == "mirror"
@@ -0,0 +1,39 @@
+import pytest
+
+from agent import match_job_query_template
+from skills import skill_index
+
+def test_parses_role_location_and_work_mode():
+    params = match_job_query_template("Find me remote python developer jobs in Pune")
+    assert params["keyword"] == "python developer"
+    assert params["location_name"] == "Pune"
+    assert params["work_mode"] == "work_from_home"
+    assert params["job_skills"] == "python"
+
+def test_keyword_uses_canonical_skill_names():
+    params = match_job_query_template("sklearn engineer jobs")
+    assert params["keyword"] == "scikit-learn engineer"
+    assert params["job_skills"] == "scikit-learn"
+
+@pytest.mark.parametrize("term", ["ts", "ml", "dl", "ai", "go"])
+def test_ambiguous_terms_are_left_alone(term):
+    params = match_job_query_template(f"{term} engineer jobs")
+    assert params["keyword"] == f"{term} engineer"
+    assert "job_skills" not in params
+
+def test_internship_noun_is_kept_in_the_keyword():
+    assert match_job_query_template("data analyst internships")["keyword"] == "data analyst internship"
+
+@pytest.mark.parametrize("query", [
+    "more jobs like that",
+    "python jobs in Atlantis",
+    "python jobs with salary over 20 lpa",
+    "remote hybrid python jobs",
+    "how do I prepare for interviews",
+])
+def test_queries_the_template_cannot_account_for_go_to_the_llm(query):
+    assert match_job_query_template(query) is None
+
+def test_canonicalize_replaces_aliases_but_not_ambiguous_terms():
+    assert skill_index.canonicalize("k8s and go", include_ambiguous=False) == "kubernetes and go"
+    assert skill_index.canonicalize("golang and k8s") == "go and kubernetes"
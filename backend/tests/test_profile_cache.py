@@ -0,0 +1,45 @@
+import mongomock
+
+from profile_cache import ProfileCache
+
+class WriteDuringRead:
+    """A collection whose find_one() returns the old document after a writer
+    updated it and invalidated the cache: the race a miss must not cache."""
+    def __init__(self, collection):
+        self.collection = collection
+        self.cache = None
+
+    def find_one(self, *args, **kwargs):
+        doc = self.collection.find_one(*args, **kwargs)
+        self.collection.update_one({"uid": "u1"}, {"$set": {"name": "new"}})
+        self.cache.invalidate("u1")
+        return doc
+
+def users():
+    collection = mongomock.MongoClient().db.users
+    collection.insert_one({"uid": "u1", "name": "old"})
+    return collection
+
+def test_read_overlapping_an_invalidation_is_not_cached():
+    collection = users()
+    racing = WriteDuringRead(collection)
+    cache = racing.cache = ProfileCache(racing)
+
+    assert cache.get("u1")["name"] == "old"
+    assert cache.stats["stale_reads"] == 1
+
+    cache.collection = collection
+    assert cache.get("u1")["name"] == "new"
+
+def test_hits_are_copies():
+    cache = ProfileCache(users())
+    cache.get("u1")["name"] = "edited by a caller"
+    assert cache.get("u1")["name"] == "old"
+    assert cache.stats["hits"] == 1
+
+def test_missing_user_is_cached_only_briefly():
+    collection = users()
+    cache = ProfileCache(collection, miss_ttl=0)
+    assert cache.get("u2") is None
+    collection.insert_one({"uid": "u2", "name": "just signed up"})
+    assert cache.get("u2")["name"] == "just signed up"
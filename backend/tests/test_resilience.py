@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import resilience
+from deadline import DeadlineExceeded, deadline
+from resilience import CircuitBreaker, CircuitOpenError, guarded_get, hedged_get
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+@pytest.fixture
+def calls(monkeypatch):
+    """requests.get replaced by a recorder; set calls.delay to make it slow (ignoring its timeout)."""
+    class Calls(list):
+        delay = 0.0
+        status_code = 200
+
+    recorded = Calls()
+
+    def get(url, timeout=None, **kwargs):
+        recorded.append({"thread": threading.current_thread().name, "timeout": timeout})
+        time.sleep(recorded.delay)
+        return FakeResponse(recorded.status_code)
+
+    monkeypatch.setattr(resilience.requests, "get", get)
+    return recorded
+
+def warmed_breaker(latency=0.01):
+    breaker = CircuitBreaker("test")
+    for _ in range(20):
+        breaker.record(True, latency)
+    return breaker
+
+def test_without_p95_the_request_runs_on_the_callers_thread(calls):
+    hedged_get(CircuitBreaker("test"), "http://upstream", timeout=2)
+    assert [c["thread"] for c in calls] == [threading.current_thread().name]
+
+def test_slow_first_attempt_is_hedged_with_the_time_left(calls):
+    calls.delay = 0.2
+    hedged_get(warmed_breaker(), "http://upstream", timeout=2)
+    assert len(calls) == 2
+    assert all(c["thread"].startswith("hedge") for c in calls)
+    assert calls[1]["timeout"] < calls[0]["timeout"] == 2
+
+def test_busy_pool_falls_back_to_the_callers_thread(calls, monkeypatch):
+    monkeypatch.setattr(resilience, "_hedge_slots", threading.BoundedSemaphore(1))
+    resilience._hedge_slots.acquire()
+    try:
+        hedged_get(warmed_breaker(), "http://upstream", timeout=2)
+    finally:
+        resilience._hedge_slots.release()
+    assert [c["thread"] for c in calls] == [threading.current_thread().name]
+
+def test_wait_is_bounded_by_the_deadline(calls):
+    calls.delay = 1.0
+    breaker = warmed_breaker()
+    start = time.monotonic()
+    with deadline(0.3), pytest.raises(DeadlineExceeded):
+        hedged_get(breaker, "http://upstream", timeout=5)
+    assert time.monotonic() - start < 0.6
+    # Cut short by the deadline: not held against the upstream
+    assert breaker.stats["failures"] == 0
+
+def test_guarded_get_sends_once_from_the_callers_thread(calls):
+    calls.delay = 0.2
+    guarded_get(warmed_breaker(), "http://upstream/generate-session", timeout=2)
+    assert [c["thread"] for c in calls] == [threading.current_thread().name]
+
+def test_breaker_opens_on_server_errors_and_fails_fast(calls):
+    calls.status_code = 503
+    breaker = CircuitBreaker("test", min_calls=2, open_seconds=60)
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            hedged_get(breaker, "http://upstream")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        hedged_get(breaker, "http://upstream")
+    assert len(calls) == 2
+
+def test_client_errors_do_not_count_as_failures(calls):
+    calls.status_code = 404
+    breaker = CircuitBreaker("test", min_calls=1)
+    assert hedged_get(breaker, "http://upstream").status_code == 404
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded, deadline
+from singleflight import SingleFlight
+
+def start_leader(flight, error):
+    """A leader for "key" that raises `error` once the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+    def fn():
+        started.set()
+        release.wait(5)
+        raise error
+    def lead():
+        with pytest.raises(type(error)):
+            flight.do("key", fn)
+    thread = threading.Thread(target=lead)
+    thread.start()
+    started.wait(5)
+    return release, thread
+
+def start_follower(flight, fn, outcomes, seconds=None):
+    """A caller that joins the leader's call; appends what it got (a result or an error) to outcomes."""
+    def follow():
+        try:
+            if seconds is None:
+                outcomes.append(flight.do("key", fn))
+            else:
+                with deadline(seconds):
+                    outcomes.append(flight.do("key", fn))
+        except Exception as e:
+            outcomes.append(e)
+    thread = threading.Thread(target=follow)
+    thread.start()
+    while flight.stats["coalesced"] == 0:
+        time.sleep(0.001)
+    return thread
+
+def finish(release, *threads):
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+@pytest.mark.parametrize("seconds", [None, 5])
+def test_waiter_with_time_left_retries_after_leader_deadline(seconds):
+    flight = SingleFlight("test")
+    release, leader = start_leader(flight, DeadlineExceeded("leader's budget"))
+    outcomes = []
+    finish(release, leader, start_follower(flight, lambda: "fresh", outcomes, seconds))
+    assert outcomes == ["fresh"]
+    assert flight.stats["retries"] == 1
+
+def test_other_leader_errors_reach_waiters():
+    flight = SingleFlight("test")
+    error = ValueError("bad response")
+    release, leader = start_leader(flight, error)
+    outcomes = []
+    finish(release, leader, start_follower(flight, lambda: "fresh", outcomes))
+    assert outcomes == [error]
+    assert flight.stats["retries"] == 0
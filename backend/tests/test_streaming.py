@@ -0,0 +1,32 @@
+from flask import Flask, Response
+
+import middleware
+from json_stream import ArrayItemParser
+from rate_limit import ConcurrencyLimiter
+
+def test_stream_holds_its_concurrency_slot_until_closed(monkeypatch):
+    limiter = ConcurrencyLimiter(1, 0)
+    monkeypatch.setattr(middleware.rate_limiter, "concurrency", limiter)
+    app = Flask(__name__)
+
+    @app.route("/stream")
+    @middleware.admission_control
+    def stream():
+        return Response(iter(["one\n", "two\n"]))
+
+    response = app.test_client().get("/stream", buffered=False)
+    assert not limiter.acquire()
+    response.close()
+    assert limiter.acquire()
+
+def test_parser_skips_brackets_in_the_preamble():
+    parser = ArrayItemParser()
+    items = parser.feed('Based on [1] and [ "x" ], here it is:\n```json\n[\n  {"step": "a [b]"},')
+    items += parser.feed(' {"step": "c"}]')
+    assert items == ['{"step": "a [b]"}', '{"step": "c"}']
+    assert parser.done
+
+def test_parser_keeps_an_unfinished_item():
+    parser = ArrayItemParser()
+    parser.feed('[{"step": "a"}, {"step": "trunc')
+    assert parser.remainder() == '{"step": "trunc'
@@ -4,8 +4,8 @@ import json
 from config.config import Config
 
 class HerkeyAPIClient:
-    def __init__(self):
-        self.base_url = Config.HERKEY_API_BASE_URL
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or Config.HERKEY_API_BASE_URL).rstrip('/')
         self.headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json'
@@ -46,4 +46,36 @@ class HerkeyAPIClient:
                 "data": None
             }
     
+    def generate_session(self):
+        """
+        Get a JWT session token from HerKey
+        
+        Returns:
+            str: The session token
+        """
+        response = requests.get(f"{self.base_url}/generate-session", timeout=10)
+        response.raise_for_status()
+        return response.json()["body"]["session_id"]
+    
+    def es_candidate_jobs(self, query_params, token=None):
+        """
+        Search the HerKey candidate jobs index
+        
+        Args:
+            query_params (dict): Parameters for job search (page_no, page_size, keyword, ...)
+            token (str, optional): Session token, a new one is generated if missing
+            
+        Returns:
+            dict: Raw API response with "body" (jobs) and "pagination"
+        """
+        token = token or self.generate_session()
+        response = requests.get(
+            f"{self.base_url}/jobs/es_candidate_jobs",
+            params=query_params,
+            headers={**self.headers, 'Authorization': f"Token {token}"},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    
     # [Rest of the code remains the same]
@@ -0,0 +1,102 @@
+# tools/fake_herkey.py
+"""
+A tiny offline stand-in for the HerKey API, enough to run the job mirror locally.
+
+Usage (from the backend folder):
+    python -m tools.fake_herkey --port 8765 --jobs 500
+    HERKEY_API_BASE_URL=http://localhost:8765/api/v1/herkey JOB_MIRROR_ENABLED=true python app.py
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TITLES = ["Data Analyst", "Python Developer", "Product Manager", "UX Designer", "DevOps Engineer",
+          "Data Scientist", "Java Developer", "HR Business Partner", "Content Writer", "Finance Associate"]
+SKILLS = ["python", "sql", "java", "react", "aws", "kubernetes", "figma", "excel", "tableau", "communication"]
+LOCATIONS = ["Mumbai", "Pune", "Bangalore", "Delhi", "Hyderabad", "Chennai"]
+WORK_MODES = ["work_from_home", "work_from_office", "hybrid", "freelance"]
+JOB_TYPES = ["full_time", "part_time", "freelance", "returnee_program", "volunteer"]
+
+def make_jobs(count, seed=0):
+    """Generate deterministic fake listings; roughly one in ten is already expired."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    jobs = []
+    for i in range(1, count + 1):
+        expires = now + timedelta(days=rng.randint(-10, 60) if i % 10 == 0 else rng.randint(1, 60))
+        jobs.append({
+            "id": i,
+            "title": rng.choice(TITLES),
+            "company_name": f"Company {i % 37}",
+            "location_name": rng.choice(LOCATIONS),
+            "skills": rng.sample(SKILLS, 3),
+            "work_mode": [rng.choice(WORK_MODES)],
+            "job_types": [rng.choice(JOB_TYPES)],
+            "min_year": 0,
+            "max_year": rng.randint(1, 10),
+            "status": "active",
+            "expires_on": expires.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return jobs
+
+class FakeHerkeyHandler(BaseHTTPRequestHandler):
+    jobs = []
+
+    def _send(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path.endswith("/generate-session"):
+            return self._send({"success": True, "body": {"session_id": "fake-session"}})
+
+        if url.path.endswith("/jobs/es_candidate_jobs"):
+            if not self.headers.get("Authorization", "").startswith("Token "):
+                return self._send({"response_code": 403, "message": "Forbidden"}, 403)
+            results = self.jobs
+            keyword = query.get("keyword", "").lower()
+            if keyword:
+                results = [j for j in results if keyword in j["title"].lower() or keyword in " ".join(j["skills"])]
+            page_no = int(query.get("page_no", 1))
+            page_size = int(query.get("page_size", 15))
+            start = (page_no - 1) * page_size
+            return self._send({
+                "response_code": 200,
+                "message": "ok",
+                "pagination": {
+                    "page_no": str(page_no),
+                    "page_size": str(page_size),
+                    "total_items": len(results),
+                    "has_next": start + page_size < len(results),
+                },
+                "body": results[start:start + page_size],
+            })
+
+        self._send({"response_code": 404, "message": "Not found"}, 404)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=8765, job_count=500):
+    """Start the fake server in the foreground."""
+    FakeHerkeyHandler.jobs = make_jobs(job_count)
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeHerkeyHandler)
+    print(f"Fake HerKey listening on http://127.0.0.1:{port}/api/v1/herkey")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline fake of the HerKey API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jobs", type=int, default=500)
+    args = parser.parse_args()
+    serve(args.port, args.jobs)
@@ -0,0 +1,207 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from dotenv import load_dotenv
+from flask import make_response
+
+from profiler import profiled_thread
+
+load_dotenv()
+
+# Traces at least this slow (or with an error) are always kept; the rest are sampled
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class _NoopSpan:
+    """Returned outside a trace, so instrumented code can call set() unconditionally."""
+    def set(self, **attributes):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    def __init__(self, name, attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.root = Span(self, name, None, attributes)
+        # Spans may finish on pool threads; list.append is atomic
+        self.spans = []
+
+    @property
+    def duration_ms(self):
+        return self.root.duration_ms
+
+    @property
+    def has_error(self):
+        return any(span.error for span in self.spans)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": self.duration_ms,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+class TailSampler:
+    """Decides once a trace has finished: slow or failed traces are kept, the rest at `sample_rate`."""
+    def __init__(self, slow_ms=TRACE_SLOW_MS, sample_rate=TRACE_SAMPLE_RATE):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+
+    def keep(self, trace):
+        return trace.duration_ms >= self.slow_ms or trace.has_error or random.random() < self.sample_rate
+
+class JSONLExporter:
+    """Appends one JSON line per kept trace to a local file (works offline)."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class NullExporter:
+    def export(self, trace):
+        pass
+
+class Tracer:
+    """
+    Request-scoped tracing. The active trace and span live in context variables,
+    so nested spans find their parent without passing it around; work handed to
+    a thread pool keeps them when submitted through `submit`. Finished traces go
+    through the tail sampler and kept ones to the exporter, which is any object
+    with an export(trace) method.
+    """
+    def __init__(self, exporter, sampler=None):
+        self.exporter = exporter
+        self.sampler = sampler or TailSampler()
+        self.stats = {"traces": 0, "kept": 0, "dropped": 0, "export_errors": 0}
+
+    @contextmanager
+    def trace(self, name, **attributes):
+        trace = Trace(name, attributes)
+        trace_token = _current_trace.set(trace)
+        try:
+            with self._span(trace, trace.root):
+                yield trace
+        finally:
+            _current_trace.reset(trace_token)
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """A child span of the current one; a no-op outside a trace."""
+        trace = _current_trace.get()
+        if trace is None:
+            yield NOOP_SPAN
+            return
+        parent = _current_span.get()
+        with self._span(trace, Span(trace, name, parent.span_id if parent else None, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def _span(self, trace, span):
+        span_token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            _current_span.reset(span_token)
+            trace.spans.append(span)
+
+    @staticmethod
+    def submit(executor, fn, *args, **kwargs):
+        """executor.submit that runs fn in a copy of the caller's context, keeping its trace and
+        parent span; the pool thread also joins the request's profile, if it is being profiled."""
+        return executor.submit(contextvars.copy_context().run, _run_task, fn, *args, **kwargs)
+
+    def _finish(self, trace):
+        self.stats["traces"] += 1
+        if not self.sampler.keep(trace):
+            self.stats["dropped"] += 1
+            return
+        self.stats["kept"] += 1
+        try:
+            self.exporter.export(trace)
+        except Exception as e:
+            self.stats["export_errors"] += 1
+            print(f"Trace export failed: {e}")
+
+def _run_task(fn, *args, **kwargs):
+    with profiled_thread():
+        return fn(*args, **kwargs)
+
+def token_usage(message):
+    """Input/output token counts reported on an LLM response message (empty if the provider gave none)."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    if usage:
+        return {"input_tokens": usage.get("prompt_tokens"), "output_tokens": usage.get("completion_tokens")}
+    return {}
+
+def make_exporter():
+    if os.getenv("TRACE_EXPORTER", "jsonl") == "none":
+        return NullExporter()
+    return JSONLExporter(os.getenv("TRACE_FILE", "traces/traces.jsonl"))
+
+tracer = Tracer(make_exporter())
+
+def traced_request(name):
+    """Run a Flask view inside a trace and return its id in an X-Trace-Id header."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.trace(name) as trace:
+                response = make_response(fn(*args, **kwargs))
+                trace.root.set(status=response.status_code)
+            response.headers["X-Trace-Id"] = trace.trace_id
+            return response
+        return wrapper
+    return decorator
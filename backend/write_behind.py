@@ -0,0 +1,126 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+class WriteBehindBuffer:
+    """
+    Buffers inserts for a Mongo collection and writes them with insert_many
+    from a background thread, either when `max_batch` documents are waiting or
+    every `flush_interval` seconds. Memory is bounded by `max_pending`: callers
+    block for up to `put_timeout` seconds when the buffer is full, then fall back
+    to a synchronous insert. Pending documents are flushed on process exit.
+    """
+    def __init__(self, collection, max_batch=50, flush_interval=1.0, max_pending=1000, put_timeout=2.0, max_retries=3):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._queue = deque()
+        self._in_flight = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stopped = False
+        self.stats = {"buffered": 0, "written": 0, "batches": 0, "sync_fallbacks": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, doc):
+        """Queue a document (it must already carry its _id)."""
+        with self._cond:
+            deadline = time.monotonic() + self.put_timeout
+            while len(self._queue) >= self.max_pending and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            if len(self._queue) < self.max_pending and not self._stopped:
+                self._queue.append((doc, 0))
+                self.stats["buffered"] += 1
+                if len(self._queue) >= self.max_batch:
+                    self._cond.notify_all()
+                return
+
+        # Buffer full for too long (or shutting down): write through instead
+        self.stats["sync_fallbacks"] += 1
+        self.collection.insert_one(doc)
+
+    def pending(self, predicate):
+        """Documents matching predicate that are not yet confirmed written (for read-your-writes)."""
+        with self._cond:
+            items = [doc for doc, _ in self._in_flight] + [doc for doc, _ in self._queue]
+        return [doc for doc in items if predicate(doc)]
+
+    def _write(self, batch):
+        docs = [doc for doc, _ in batch]
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Documents already written by an earlier, partly failed attempt are fine
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+        self.stats["written"] += len(docs)
+        self.stats["batches"] += 1
+
+    def _take_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.max_batch:
+            batch.append(self._queue.popleft())
+        self._in_flight = batch
+        self._cond.notify_all()
+        return batch
+
+    def _flush_batch(self, batch):
+        try:
+            self._write(batch)
+            requeue = []
+        except Exception as e:
+            print(f"Write-behind insert failed: {str(e)}")
+            requeue = [(doc, attempts + 1) for doc, attempts in batch if attempts + 1 < self.max_retries]
+            self.stats["failed"] += len(batch) - len(requeue)
+        with self._cond:
+            self._in_flight = []
+            self._queue.extendleft(reversed(requeue))
+
+    def _flush_once(self):
+        """Take and write one batch; returns False when there was nothing to write."""
+        with self._write_lock:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return False
+            self._flush_batch(batch)
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._queue) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            self._flush_once()
+
+    def flush(self):
+        """Write everything that is queued right now, on the calling thread."""
+        while self._flush_once():
+            pass
+
+    def close(self):
+        """Stop the background thread and flush what is left."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()